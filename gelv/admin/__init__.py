@@ -1,12 +1,13 @@
 from .admin_site import CustomAdminSite
 from . import admin_models as am
-from gelv.models import User, Journal, Issue, Subscription, IssueOrder, SubscriptionOrder, Payment, Post, Ad
+from gelv.models import User, Journal, Issue, Subscription, IssueOrder, SubscriptionOrder, Payment, Post, Ad, Job, DownloadEvent, DownloadRollup
 
 apps = {
     "store": (Journal, Issue, Subscription),
     "users": (User,),
     "orders": (Payment, SubscriptionOrder, IssueOrder),
     "content": (Post, Ad),
+    "system": (Job, DownloadRollup, DownloadEvent),
 }
 
 admin_site = CustomAdminSite(name="customadmin", apps=apps)
@@ -20,3 +21,6 @@ admin_site.register(SubscriptionOrder, am.SubscriptionOrderAdmin)
 admin_site.register(IssueOrder)
 admin_site.register(Post, am.PostAdmin)
 admin_site.register(Ad, am.AdAdmin)
+admin_site.register(Job, am.JobAdmin)
+admin_site.register(DownloadEvent, am.DownloadEventAdmin)
+admin_site.register(DownloadRollup, am.DownloadRollupAdmin)
@@ -1,9 +1,14 @@
-from django.contrib import admin
+from django import forms
+from django.core.exceptions import PermissionDenied
+from django.contrib import admin, messages
 from django.urls import path
-from django.db.models import Max
+from django.db.models import Max, Sum
 from django.http import HttpResponse
+from django.template.response import TemplateResponse
 from gelv.models import User, Journal, Issue, Subscription, IssueOrder, SubscriptionOrder, Payment, Ad
 from gelv.admin.admin_site import admin_site
+from gelv import reconcile
+from gelv.tasks import send_payment_confirmations
 
 
 class IssueAdmin(admin.ModelAdmin):
@@ -39,13 +44,69 @@ class IssueAdmin(admin.ModelAdmin):
         js = ('gelv/admin/js/issue_admin.js',)
 
 
+class StatementForm(forms.Form):
+    statement = forms.FileField(help_text='bank statement export, CSV or XLSX')
+    dry_run = forms.BooleanField(required=False, help_text='only show what would be matched')
+
+
 class PaymentAdmin(admin.ModelAdmin):
-    list_display = ('__str__', 'user', 'total_price', 'paid', 'products', 'comment', 'invoice')
-    search_fields = ('user', 'products', 'comment')
+    list_display = ('__str__', 'user', 'total', 'paid', 'summary', 'comment', 'invoice')
+    list_select_related = ('user',)
+    search_fields = ('user__email', 'name', 'billing_email', 'summary', 'comment')
+    actions = ('mark_paid',)
+    change_list_template = 'admin/gelv/payment/change_list.html'
+
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('import-statement/', self.admin_site.admin_view(self.import_statement), name='gelv_payment_import'),
+        ]
+        return custom_urls + urls
+
+    def _confirm(self, request, payments):
+        """Mail confirmations in batches over one connection, reporting each batch."""
+        for ix, (batch, error) in enumerate(send_payment_confirmations(payments), start=1):
+            numbers = ', '.join(payment.number for payment in batch)
+            if error is None:
+                self.message_user(request, f'Batch {ix}: {len(batch)} confirmations sent.', messages.SUCCESS)
+            else:
+                self.message_user(
+                    request, f'Batch {ix}: sending confirmations failed ({error}) for {numbers}.', messages.ERROR
+                )
 
-    @admin.display()
-    def products(self, obj):
-        return ", ".join(map(str, obj.products))
+    @admin.action(description='Mark selected payments as paid')
+    def mark_paid(self, request, queryset):
+        payments = reconcile.mark_paid(queryset.values_list('id', flat=True))
+        if not payments:
+            self.message_user(request, 'All selected payments were already paid.', messages.WARNING)
+            return
+        self.message_user(request, f'{len(payments)} payments marked as paid.', messages.SUCCESS)
+        self._confirm(request, payments)
+
+    def import_statement(self, request):
+        """Reconcile open payments against an uploaded bank statement."""
+        if not self.has_change_permission(request):
+            raise PermissionDenied
+        form = StatementForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['statement']
+            result = reconcile.reconcile(reconcile.read_statement(upload.file, upload.name))
+            if form.cleaned_data['dry_run']:
+                self.message_user(request, f'{len(result.matched)} lines would be matched.', messages.INFO)
+            else:
+                payments = reconcile.mark_paid(result.payment_ids)
+                self.message_user(request, f'{len(payments)} payments marked as paid.', messages.SUCCESS)
+                self._confirm(request, payments)
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Import bank statement',
+            'opts': self.model._meta,
+            'form': form,
+            'result': result,
+        }
+        return TemplateResponse(request, 'admin/gelv/payment/import_statement.html', context)
 
 
 class SubscriptionAdmin(admin.ModelAdmin):
@@ -68,3 +129,58 @@ class AdAdmin(admin.ModelAdmin):
 
 class SubscriptionOrderAdmin(admin.ModelAdmin):
     list_display = ('__str__', 'start', 'end')
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('__str__', 'name', 'status', 'attempts', 'run_at', 'finished')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created', 'finished', 'locked_at', 'last_error')
+
+
+class DownloadEventAdmin(admin.ModelAdmin):
+    list_display = ('created', 'user', 'issue', 'kind')
+    list_filter = ('kind',)
+    list_select_related = ('user', 'issue__journal')
+    search_fields = ('user__email',)
+    date_hierarchy = 'created'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+class DownloadRollupAdmin(admin.ModelAdmin):
+    """
+    Daily download counts, with per-issue and per-user totals of the filtered days above the list.
+    """
+    list_display = ('day', 'user', 'issue', 'count')
+    list_select_related = ('user', 'issue__journal')
+    search_fields = ('user__email',)
+    date_hierarchy = 'day'
+    change_list_template = 'admin/gelv/downloadrollup/change_list.html'
+    top = 20
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        response = super().changelist_view(request, extra_context)
+        try:
+            rollups = response.context_data['cl'].queryset.order_by()
+        except (AttributeError, KeyError):
+            return response  # a redirect or an error page
+
+        by_issue = list(rollups.values('issue').annotate(total=Sum('count')).order_by('-total')[:self.top])
+        issues = Issue.objects.select_related('journal').in_bulk([row['issue'] for row in by_issue])
+        by_user = list(rollups.values('user__email').annotate(total=Sum('count')).order_by('-total')[:self.top])
+        response.context_data.update({
+            'downloads_total': rollups.aggregate(total=Sum('count', default=0))['total'],
+            'by_issue': [(issues.get(row['issue']), row['total']) for row in by_issue],
+            'by_user': [(row['user__email'], row['total']) for row in by_user],
+        })
+        return response
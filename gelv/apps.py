@@ -8,3 +8,4 @@ class GelvConfig(AppConfig):
     def ready(self):
         import gelv.admin.admin_models  # noqa
         import gelv.signals  # noqa
+        import gelv.tasks  # noqa
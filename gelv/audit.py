@@ -0,0 +1,119 @@
+import atexit
+import logging
+import os
+import threading
+from collections import Counter
+from datetime import date
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from typing import Optional
+from gelv.models import DownloadEvent, DownloadRollup
+from gelv.utils import trace
+
+
+class DownloadLog:
+    """
+    Buffers download events in the process and writes them in batches from a background thread:
+    as soon as settings.DOWNLOAD_LOG_BATCH events are waiting, every settings.DOWNLOAD_LOG_INTERVAL seconds
+    otherwise, and at exit. Each flush is one bulk insert of events plus one rollup increment per (day, user, issue).
+    Downloads never wait for the database. While it fails, at most settings.DOWNLOAD_LOG_MAX_BUFFER events
+    are kept and the overflow is dropped with a warning, as are the events of a crashed process;
+    that's the price of keeping writes off the download path.
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.pid = os.getpid()
+        self.events: list[DownloadEvent] = []
+        self.dropped = 0
+
+    def record(self, user_id: Optional[int], issue_id: int, kind: str = DownloadEvent.SINGLE) -> None:
+        event = DownloadEvent(user_id=user_id, issue_id=issue_id, kind=kind, created=timezone.now())
+        with self.lock:
+            if os.getpid() != self.pid:
+                # a forked worker starts empty: what it inherited is its parent's to write
+                self._reset()
+                self.thread = None
+            self._keep([event])
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, name='gelv-download-log', daemon=True)
+                self.thread.start()
+            full = len(self.events) >= getattr(settings, 'DOWNLOAD_LOG_BATCH', 100)
+        if full:
+            self.wakeup.set()
+
+    def _keep(self, events: list[DownloadEvent]) -> None:
+        """Append events to the buffer (under the lock), dropping what doesn't fit."""
+        room = max(getattr(settings, 'DOWNLOAD_LOG_MAX_BUFFER', 10000) - len(self.events), 0)
+        self.events += events[:room]
+        self.dropped += len(events[room:])
+
+    def _run(self) -> None:
+        while True:
+            self.wakeup.wait(getattr(settings, 'DOWNLOAD_LOG_INTERVAL', 30))
+            self.wakeup.clear()
+            self.flush()
+            # this thread's connection would otherwise stay open (and possibly broken) between flushes
+            close_old_connections()
+
+    def flush(self) -> int:
+        """Write the buffered events; returns how many were written."""
+        with self.lock:
+            events, self.events = self.events, []
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            trace(dropped, 'download events dropped, the buffer was full', level=logging.WARNING)
+        if not events:
+            return 0
+        try:
+            write(events)
+        except Exception as e:
+            trace(e, 'writing download events failed', level=logging.ERROR, events=len(events))
+            with self.lock:
+                # back in front of newer events, as far as the buffer allows
+                newer, self.events = self.events, []
+                self._keep(events)
+                self._keep(newer)
+            return 0
+        return len(events)
+
+
+def _add_anonymous(day: date, issue_id: int, count: int) -> None:
+    """
+    Add to the rollup of downloads without a user. The unique constraint doesn't cover these rows (NULLs are
+    distinct, and deleting users leaves several of them anyway), so increment the oldest one or create it.
+    """
+    pk = DownloadRollup.objects.filter(day=day, user__isnull=True, issue=issue_id).order_by('pk').values_list(
+        'pk', flat=True
+    ).first()
+    if pk is None:
+        DownloadRollup.objects.create(day=day, issue_id=issue_id, count=count)
+    else:
+        DownloadRollup.objects.filter(pk=pk).update(count=F('count') + count)
+
+
+def write(events: list[DownloadEvent]) -> None:
+    counts = Counter((timezone.localdate(event.created), event.user_id, event.issue_id) for event in events)
+    with transaction.atomic():
+        DownloadEvent.objects.bulk_create(events)
+        # create missing rollup rows, then increment them all atomically, so concurrent flushes add up
+        DownloadRollup.objects.bulk_create(
+            [DownloadRollup(day=day, user_id=user_id, issue_id=issue_id)
+             for day, user_id, issue_id in counts if user_id is not None],
+            ignore_conflicts=True,
+        )
+        for (day, user_id, issue_id), count in counts.items():
+            if user_id is None:
+                _add_anonymous(day, issue_id, count)
+            else:
+                DownloadRollup.objects.filter(day=day, user=user_id, issue=issue_id).update(count=F('count') + count)
+
+
+download_log = DownloadLog()
+atexit.register(download_log.flush)
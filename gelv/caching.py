@@ -0,0 +1,59 @@
+import time
+from django.core.cache import cache
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db.models import Model
+from typing import Any, Callable, Iterable, TypeVar
+from gelv.timing import count_cache
+
+T = TypeVar('T')
+
+
+def _version_key(model: type[Model]) -> str:
+    return f'gelv:version:{model._meta.label_lower}'
+
+
+def _new_version() -> int:
+    # seeded from the clock, so an evicted counter never restarts at a value that was already used
+    return time.time_ns() // 1000
+
+
+def get_versions(models: Iterable[type[Model]]) -> list[int]:
+    """Get the current data versions of models, initializing missing counters."""
+    models = list(models)
+    keys = [_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, _new_version(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_version(model: type[Model]) -> None:
+    """Invalidate every cached value depending on a model, in O(1)."""
+    try:
+        cache.incr(_version_key(model))
+    except ValueError:
+        cache.set(_version_key(model), _new_version(), timeout=None)
+
+
+def versioned_key(name: str, models: Iterable[type[Model]], *parts: Any) -> str:
+    """Build a cache key that changes whenever any of the models' data changes."""
+    versions = '.'.join(map(str, get_versions(models)))
+    return ':'.join(map(str, ('gelv', name, versions, *parts)))
+
+
+def cached(name: str, models: Iterable[type[Model]], compute: Callable[[], T],
+           *parts: Any, timeout: Any = DEFAULT_TIMEOUT) -> T:
+    """
+    Get a value computed from the models' data, computing and caching it on a miss.
+    Values never go stale: a change to any of the models moves the key,
+    in every process as long as the cache is shared between them (see CACHES in settings).
+    """
+    key = versioned_key(name, models, *parts)
+    value = cache.get(key)
+    count_cache(name, hit=value is not None)
+    if value is None:
+        value = compute()
+        cache.set(key, value, timeout)
+    return value
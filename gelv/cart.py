@@ -1,9 +1,8 @@
-from django.shortcuts import get_object_or_404
 from django.http import JsonResponse, HttpRequest, HttpResponse
 import json
-from typing import TypedDict, Any, Callable, Optional, TypeGuard, get_type_hints, cast
+from typing import TypedDict, Any, Callable, Optional, TypeGuard, get_type_hints
 from gelv.utils import get_request_content, trace, IssueN
-from gelv.models import AbstractProduct, Issue, Subscription, product_types, AnyProduct
+from gelv.models import AbstractProduct, Journal, Issue, Subscription, product_types, AnyProduct
 from gelv.forms import CartSingletonForm
 
 
@@ -115,10 +114,27 @@ class Cart:
     def __init__(self, data: Raw):
         trace(data, "generating cart")
         self.items = []
+
+        # load all products of a type with a single query
+        ids: dict[str, set[int]] = {}
         for item_data in data:
-            klass = cart_metadata_registry.product_classes[item_data['type']]
-            product = get_object_or_404(klass, id=item_data['id'])
-            self.items.append(CartItem(cast(AnyProduct, product), **item_data['metadata']))
+            ids.setdefault(item_data['type'], set()).add(item_data['id'])
+        products: dict[str, dict[int, AnyProduct]] = {
+            type_name: cart_metadata_registry.product_classes[type_name].objects.select_related('journal').in_bulk(type_ids)
+            for type_name, type_ids in ids.items() if type_name in cart_metadata_registry.product_classes
+        }
+        # subscription start defaults need the latest issue of each journal
+        Journal.prefetch_latest_numbers(
+            product.journal for type_products in products.values() for product in type_products.values()
+            if isinstance(product, Subscription)
+        )
+
+        for item_data in data:
+            product = products.get(item_data['type'], {}).get(item_data['id'])
+            if product is None:
+                trace(item_data, 'dropping unavailable cart item')
+                continue
+            self.items.append(CartItem(product, **item_data['metadata']))
 
     @property
     def total_price(self) -> float:
@@ -173,11 +189,16 @@ class Cart:
             return False
 
     @classmethod
-    def from_session(cls, session: dict) -> 'Cart':
-        return Cart(session.get('cart', []))
+    def from_request(cls, request: HttpRequest) -> 'Cart':
+        from gelv.cart_store import get_cart_store
+        return Cart(get_cart_store().load(request))
+
+    def save(self, request: HttpRequest) -> None:
+        from gelv.cart_store import get_cart_store
+        get_cart_store().save(request, self.raw)
 
     def __len__(self):
-        len(self.items)
+        return len(self.items)
 
     def __bool__(self):
         return bool(self.items)
@@ -188,5 +209,5 @@ class Cart:
     @staticmethod
     def get_cart_count(request: HttpRequest) -> HttpResponse:
         """Get total number of items in cart"""
-        cart = request.session.get('cart', [])
-        return JsonResponse({'cart_count': len(cart)})
+        from gelv.cart_store import get_cart_store
+        return JsonResponse({'cart_count': len(get_cart_store().load(request))})
@@ -0,0 +1,124 @@
+import logging
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+from django.utils.module_loading import import_string
+from functools import cache
+from typing import Any, Callable
+from gelv.cart import Cart, CartItem, cart_metadata_registry
+from gelv.utils import trace
+
+
+class CartStore:
+    """
+    Where the raw cart of a request is kept between requests.
+    """
+    def load(self, request: HttpRequest) -> Cart.Raw:
+        raise NotImplementedError
+
+    def save(self, request: HttpRequest, raw: Cart.Raw) -> None:
+        raise NotImplementedError
+
+
+class SessionCartStore(CartStore):
+    """
+    Cart in the session; every change is a session row write.
+    """
+    def load(self, request):
+        return request.session.get('cart', [])
+
+    def save(self, request, raw):
+        request.session['cart'] = raw
+        request.session.modified = True
+
+
+class CookieCartStore(CartStore):
+    """
+    Cart in a compact signed cookie, so cart changes cost no database writes.
+    Items are encoded as <type code><id>[-<metadata value>...], joined by dots, e.g. 'i12.s3-184'.
+    Carts too large for a cookie, and carts from before the cookie store, live in the session.
+    """
+    cookie_name = 'cart'
+    salt = 'gelv.cart'
+    max_size = 3500
+
+    type_codes = {'issue': 'i', 'subscription': 's'}
+    code_types = {code: type_name for type_name, code in type_codes.items()}
+
+    def encode(self, raw: Cart.Raw) -> str:
+        def encode_item(item: CartItem.Raw) -> str:
+            product_class = cart_metadata_registry.product_classes[item['type']]
+            values = [str(item['metadata'][field]) for field in cart_metadata_registry.get_schema(product_class)]
+            return '-'.join([f"{self.type_codes[item['type']]}{item['id']}", *values])
+        return '.'.join(map(encode_item, raw))
+
+    def decode(self, value: str) -> Cart.Raw:
+        raw: Cart.Raw = []
+        for chunk in filter(None, value.split('.')):
+            head, *values = chunk.split('-')
+            type_name = self.code_types[head[0]]
+            schema = cart_metadata_registry.get_schema(cart_metadata_registry.product_classes[type_name])
+            metadata = {field: config['type'](v) for (field, config), v in zip(schema.items(), values)}
+            raw.append({'type': type_name, 'id': int(head[1:]), 'metadata': metadata})
+        return raw
+
+    def load(self, request):
+        if hasattr(request, '_cart_raw'):
+            return request._cart_raw
+        value = request.get_signed_cookie(self.cookie_name, default=None, salt=self.salt)
+        if value is None:
+            return SessionCartStore().load(request)
+        try:
+            return self.decode(value)
+        except (KeyError, ValueError, IndexError) as e:
+            trace(e, 'discarding malformed cart cookie', level=logging.INFO)
+            return []
+
+    def save(self, request, raw):
+        value = self.encode(raw)
+        if len(value) > self.max_size:
+            SessionCartStore().save(request, raw)
+            value = ''
+        elif 'cart' in request.session:
+            del request.session['cart']
+        request._cart_raw = raw
+        request._cart_cookie = value
+
+    def apply(self, request: HttpRequest, response: HttpResponse) -> None:
+        """Write a cart changed during the request into the response."""
+        value = getattr(request, '_cart_cookie', None)
+        if value is None:
+            return
+        if value:
+            response.set_signed_cookie(
+                self.cookie_name, value, salt=self.salt,
+                max_age=settings.SESSION_COOKIE_AGE, httponly=True, samesite='Lax',
+                secure=settings.SESSION_COOKIE_SECURE,
+            )
+        else:
+            response.delete_cookie(self.cookie_name, samesite='Lax')
+
+
+@cache
+def get_cart_store() -> CartStore:
+    """Get the store configured in settings.CART_STORE."""
+    return import_string(getattr(settings, 'CART_STORE', 'gelv.cart_store.CookieCartStore'))()
+
+
+class CartCookieMiddleware:
+    """
+    Set the cart cookie on responses to requests that changed the cart.
+    """
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        response = self.get_response(request)
+        store = get_cart_store()
+        if isinstance(store, CookieCartStore):
+            store.apply(request, response)
+        return response
+
+
+def cart_count(request: HttpRequest) -> dict[str, Any]:
+    """Template context processor with the number of items in the cart, without touching the database."""
+    return {'cart_count': len(get_cart_store().load(request))}
@@ -0,0 +1,51 @@
+from bisect import bisect_right
+from django.db.models import F, Q
+from typing import Iterable, TypeAlias
+from gelv.models import SubscriptionOrder
+
+Interval: TypeAlias = tuple[int, int]  # [start, end) in issue numbers
+Coverage: TypeAlias = dict[int, list[Interval]]  # journal id -> merged, sorted intervals
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> list[Interval]:
+    """Merge overlapping and adjacent intervals into a sorted, non-overlapping list."""
+    merged: list[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def compute_coverage(user_id: int) -> Coverage:
+    """
+    Build a user's subscription coverage from their paid subscription orders, with one query.
+    Not cached: it only feeds reconciling the entitlement store (gelv.entitlements), which must see
+    the order tables as they are; ownership checks read the store instead.
+    """
+    rows = SubscriptionOrder.objects.filter(payment__user=user_id, payment__paid=True).annotate(
+        stop=F('start') + F('product__duration')
+    ).values_list('product__journal', 'start', 'stop')
+
+    by_journal: dict[int, list[Interval]] = {}
+    for journal_id, start, stop in rows:
+        by_journal.setdefault(journal_id, []).append((start, stop))
+    return {journal_id: merge_intervals(intervals) for journal_id, intervals in by_journal.items()}
+
+
+def covers(coverage: Coverage, journal_id: int, number: int) -> bool:
+    """Check whether an issue number of a journal falls into the coverage."""
+    intervals = coverage.get(journal_id, [])
+    ix = bisect_right(intervals, (number, float('inf'))) - 1
+    return ix >= 0 and intervals[ix][0] <= number < intervals[ix][1]
+
+
+def coverage_q(coverage: Coverage) -> Q:
+    """Issue filter matching exactly the covered issues; matches nothing for empty coverage."""
+    q = Q(pk__in=[])
+    for journal_id, intervals in coverage.items():
+        for start, end in intervals:
+            q |= Q(journal=journal_id, number__gte=start, number__lt=end)
+    return q
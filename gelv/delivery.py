@@ -0,0 +1,173 @@
+import mimetypes
+import os
+import re
+import secrets
+from django.conf import settings
+from django.db.models.fields.files import FieldFile
+from django.http import FileResponse, HttpRequest, HttpResponse, StreamingHttpResponse
+from django.utils.encoding import escape_uri_path
+from django.utils.http import content_disposition_header
+from django.utils.module_loading import import_string
+from functools import cache
+from typing import Iterator, Optional
+
+RANGE_PATTERN = re.compile(r'^\s*(\d*)\s*-\s*(\d*)\s*$')
+MAX_RANGES = 16
+CHUNK_SIZE = 64 * 1024
+
+
+def parse_range(header: str, size: int) -> Optional[list[tuple[int, int]]]:
+    """
+    Parse a `Range: bytes=...` header into sorted, merged, inclusive (start, end) ranges.
+    None means the header is to be ignored (malformed, or too many ranges) and the whole file sent;
+    an empty list means no range is satisfiable.
+    """
+    unit, _, specs = header.partition('=')
+    if unit.strip().lower() != 'bytes' or not specs:
+        return None
+    ranges = []
+    for spec in specs.split(','):
+        match = RANGE_PATTERN.match(spec)
+        if not match or match.groups() == ('', ''):
+            return None
+        first, last = match.groups()
+        if not first:  # suffix: the last n bytes
+            start, end = max(size - int(last), 0), size - 1
+        else:
+            start, end = int(first), min(int(last), size - 1) if last else size - 1
+            if last and int(last) < start:
+                return None
+        if start < size and start <= end:
+            ranges.append((start, end))
+    if len(ranges) > MAX_RANGES:
+        return None
+    merged: list[tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def read_range(file, start: int, end: int) -> Iterator[bytes]:
+    file.seek(start)
+    remaining = end - start + 1
+    while remaining > 0:
+        chunk = file.read(min(CHUNK_SIZE, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+
+def stream_parts(file: FieldFile, parts: list[tuple[bytes, int, int]], tail: bytes = b'') -> Iterator[bytes]:
+    """Stream (prefix, start, end) byte ranges of a file, closing it when done."""
+    f = file.open('rb')
+    try:
+        for prefix, start, end in parts:
+            if prefix:
+                yield prefix
+            yield from read_range(f, start, end)
+        if tail:
+            yield tail
+    finally:
+        f.close()
+
+
+class DeliveryBackend:
+    """
+    How a stored file is sent once the view has decided the user may have it.
+    """
+    def serve(self, request: HttpRequest, file: FieldFile,
+              size: Optional[int] = None, etag: Optional[str] = None) -> HttpResponse:
+        """
+        Build the response for a file. `size` is its stored size, if known (saves a stat),
+        `etag` its validator, checked against If-Range.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def _headers(response: HttpResponse, file: FieldFile) -> HttpResponse:
+        content_type, encoding = mimetypes.guess_type(file.name)
+        response['Content-Type'] = content_type or 'application/octet-stream'
+        response['Content-Disposition'] = content_disposition_header(False, os.path.basename(file.name))
+        return response
+
+
+class DjangoDelivery(DeliveryBackend):
+    """
+    Stream the file from the Django worker; fine for development, ties up a worker per download.
+    Byte ranges (single and multiple) are served here; the front servers do that themselves.
+    """
+    def serve(self, request, file, size=None, etag=None):
+        size = file.size if size is None else size
+        ranges = parse_range(request.headers['Range'], size) if 'Range' in request.headers else None
+        # a changed (or date-based, which we don't track precisely) If-Range gets the whole file
+        if_range = request.headers.get('If-Range')
+        if ranges is not None and if_range is not None and (etag is None or if_range != etag):
+            ranges = None
+
+        if ranges == []:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if request.method == 'HEAD':
+            response = self._headers(HttpResponse(), file)
+            response['Content-Length'] = size
+        elif ranges is None:
+            response = FileResponse(file.open('rb'))
+        elif len(ranges) == 1:
+            start, end = ranges[0]
+            response = self._headers(StreamingHttpResponse(stream_parts(file, [(b'', start, end)]), status=206), file)
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = end - start + 1
+        else:
+            response = self._multipart(file, ranges, size)
+        response['Accept-Ranges'] = 'bytes'
+        return response
+
+    def _multipart(self, file, ranges: list[tuple[int, int]], size: int) -> HttpResponse:
+        boundary = secrets.token_hex(16)
+        content_type = mimetypes.guess_type(file.name)[0] or 'application/octet-stream'
+        heads = [
+            f'--{boundary}\r\nContent-Type: {content_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n'.encode()
+            for start, end in ranges
+        ]
+        parts = [((b'\r\n' if ix else b'') + head, start, end) for ix, (head, (start, end)) in enumerate(zip(heads, ranges))]
+        tail = f'\r\n--{boundary}--\r\n'.encode()
+
+        response = StreamingHttpResponse(
+            stream_parts(file, parts, tail), status=206, content_type=f'multipart/byteranges; boundary={boundary}'
+        )
+        response['Content-Length'] = sum(len(prefix) + end - start + 1 for prefix, start, end in parts) + len(tail)
+        return response
+
+
+class XAccelRedirectDelivery(DeliveryBackend):
+    """
+    Hand the transfer to nginx, which serves settings.DELIVERY_INTERNAL_URL from MEDIA_ROOT
+    in an `internal` location, e.g.:
+
+        location /protected/ { internal; alias /srv/gelv/media/; }
+    """
+    def serve(self, request, file, size=None, etag=None):
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = escape_uri_path(settings.DELIVERY_INTERNAL_URL + file.name)
+        return self._headers(response, file)
+
+
+class XSendfileDelivery(DeliveryBackend):
+    """
+    Hand the transfer to Apache mod_xsendfile (or lighttpd) by the file's path on disk.
+    """
+    def serve(self, request, file, size=None, etag=None):
+        response = HttpResponse()
+        response['X-Sendfile'] = file.path
+        return self._headers(response, file)
+
+
+@cache
+def get_delivery_backend() -> DeliveryBackend:
+    """Get the backend configured in settings.DELIVERY_BACKEND."""
+    return import_string(getattr(settings, 'DELIVERY_BACKEND', 'gelv.delivery.DjangoDelivery'))()
@@ -0,0 +1,57 @@
+"""
+Signed, expiring download links. A link carries the user id, issue id and expiry with an HMAC over them,
+so it is checked without touching the database, by the app or by a front server holding the same key:
+
+    token = f'{user_id}-{expires}-{signature}'
+    signature = base64url(HMAC-SHA256(key, f'{user_id}:{issue_id}:{expires}')), unpadded, first 32 characters
+
+The functions taking a `key` use only the standard library; the others read it from the settings.
+"""
+import base64
+import hashlib
+import hmac
+import time
+from django.conf import settings
+from django.urls import reverse
+from typing import Optional
+
+
+def signature(key: bytes, user_id: int, issue_id: int, expires: int) -> str:
+    mac = hmac.new(key, f'{user_id}:{issue_id}:{expires}'.encode(), hashlib.sha256).digest()
+    return base64.urlsafe_b64encode(mac).decode().rstrip('=')[:32]
+
+
+def make_token(key: bytes, user_id: int, issue_id: int, expires: int) -> str:
+    return f'{user_id}-{expires}-{signature(key, user_id, issue_id, expires)}'
+
+
+def verify(key: bytes, issue_id: int, token: str, now: Optional[float] = None) -> Optional[int]:
+    """Check a token for an issue; returns the user id it was minted for, or None if invalid or expired."""
+    try:
+        user, expires, _ = token.split('-', 2)
+        user_id, expires_at = int(user), int(expires)
+    except ValueError:
+        return None
+    if expires_at < (time.time() if now is None else now):
+        return None
+    # compare the whole token as bytes: non-ASCII text can't be compared as str, and a non-canonical
+    # spelling of the numbers (e.g. '+7' or '0_7') must not pass as the token minted for them
+    if not hmac.compare_digest(token.encode(), make_token(key, user_id, issue_id, expires_at).encode()):
+        return None
+    return user_id
+
+
+def get_key() -> bytes:
+    """settings.DOWNLOAD_LINK_KEY, or a key derived from SECRET_KEY (so rotating it revokes links too)."""
+    key = getattr(settings, 'DOWNLOAD_LINK_KEY', None) or f'gelv.download_links{settings.SECRET_KEY}'
+    return hashlib.sha256(key.encode()).digest()
+
+
+def signed_url(user_id: int, issue_id: int) -> str:
+    """
+    Mint a download URL valid for settings.DOWNLOAD_LINK_TTL seconds.
+    Expiry is rounded up to a minute, so a page rendered twice within it links the same URL.
+    """
+    expires = (int(time.time()) + getattr(settings, 'DOWNLOAD_LINK_TTL', 3600)) // 60 * 60 + 60
+    token = make_token(get_key(), user_id, issue_id, expires)
+    return reverse('signed_download', kwargs={'id': issue_id, 'token': token})
@@ -0,0 +1,100 @@
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+from django.db.models.query import QuerySet
+from typing import Iterable
+from gelv.models import Entitlement, Issue, IssueOrder, SubscriptionOrder, Payment, User
+from gelv.coverage import compute_coverage, coverage_q
+from gelv.utils import trace
+
+
+def paid_subscription_orders() -> QuerySet[SubscriptionOrder]:
+    """Paid subscription orders annotated with `stop`, the first issue number after the range."""
+    return SubscriptionOrder.objects.filter(payment__paid=True).annotate(stop=F('start') + F('product__duration'))
+
+
+def _bought(user_id: int) -> Exists:
+    return Exists(IssueOrder.objects.filter(payment__user=user_id, payment__paid=True, product=OuterRef('pk')))
+
+
+def expected_issues(user_id: int) -> QuerySet[Issue]:
+    """
+    Issues a user owns according to the order tables.
+    This is the source of truth the entitlement store is reconciled against.
+    """
+    return Issue.objects.filter(Q(_bought(user_id)) | coverage_q(compute_coverage(user_id)))
+
+
+def owns_issue(user: User, issue_id: int) -> bool:
+    """Check whether a user owns an issue: one lookup on the (user, issue) unique index of the entitlement store."""
+    if not user.is_authenticated:
+        return False
+    return Entitlement.objects.filter(user=user.id, issue=issue_id).exists()
+
+
+def expected_users(issue: Issue) -> set[int]:
+    """Ids of users who own an issue according to the order tables."""
+    buyers = IssueOrder.objects.filter(product=issue, payment__paid=True).values_list('payment__user', flat=True)
+    subscribers = paid_subscription_orders().filter(
+        product__journal=issue.journal_id,
+        start__lte=issue.number,
+        stop__gt=issue.number,
+    ).values_list('payment__user', flat=True)
+    return set(buyers) | set(subscribers)
+
+
+def diff_user(user_id: int) -> tuple[set[int], set[int]]:
+    """Get (missing, stale) issue ids of a user's entitlements."""
+    expected = set(expected_issues(user_id).values_list('id', flat=True))
+    current = set(Entitlement.objects.filter(user=user_id).values_list('issue_id', flat=True))
+    return expected - current, current - expected
+
+
+@transaction.atomic
+def sync_user(user_id: int) -> tuple[int, int]:
+    """Reconcile a user's entitlements with their paid orders. Returns (granted, revoked)."""
+    missing, stale = diff_user(user_id)
+    if stale:
+        Entitlement.objects.filter(user=user_id, issue__in=stale).delete()
+    if missing:
+        Entitlement.objects.bulk_create(
+            [Entitlement(user_id=user_id, issue_id=issue_id) for issue_id in missing],
+            ignore_conflicts=True,
+        )
+    if missing or stale:
+        trace((len(missing), len(stale)), 'entitlements granted, revoked', user=user_id)
+    return len(missing), len(stale)
+
+
+@transaction.atomic
+def sync_issue(issue: Issue) -> tuple[int, int]:
+    """Reconcile entitlements to a single issue, e.g. after it was added or renumbered."""
+    expected = expected_users(issue)
+    current = set(Entitlement.objects.filter(issue=issue).values_list('user_id', flat=True))
+    missing, stale = expected - current, current - expected
+    if stale:
+        Entitlement.objects.filter(issue=issue, user__in=stale).delete()
+    if missing:
+        Entitlement.objects.bulk_create(
+            [Entitlement(user_id=user_id, issue=issue) for user_id in missing],
+            ignore_conflicts=True,
+        )
+    return len(missing), len(stale)
+
+
+def sync_users(user_ids: Iterable[int]) -> None:
+    for user_id in set(user_ids):
+        sync_user(user_id)
+
+
+def sync_payment(payment_id: int) -> None:
+    """Reconcile the entitlements of a payment's owner, if the payment is paid."""
+    user_id = Payment.objects.filter(pk=payment_id, paid=True).values_list('user_id', flat=True).first()
+    if user_id is not None:
+        sync_user(user_id)
+
+
+def affected_users() -> QuerySet[User]:
+    """Users that have any orders or any entitlements."""
+    return User.objects.filter(
+        Q(payment__isnull=False) | Q(entitlement__isnull=False)
+    ).distinct()
@@ -1,11 +1,209 @@
+import logging
 import openpyxl as xl
+import re
+import zipfile
 from copy import copy
 from datetime import date
-from typing import Optional
+from django.conf import settings
+from functools import cache
+from pathlib import Path
+from typing import NamedTuple, Optional
 from io import BytesIO
+from xml.sax.saxutils import escape
 from gelv.models import Payment, AbstractOrder
+from gelv import metrics
+from gelv.timing import timed_function
 from gelv.utils import verbalize_price, trace
 
+XLSX_DIR = Path(__file__).resolve().parent / 'static' / 'gelv' / 'xlsx'
+
+
+class _Cell(NamedTuple):
+    column: str
+    style: Optional[str]
+    type: Optional[str]
+    value: Optional[str]  # contents of <v>, shared string indices already remapped
+
+
+class _Row(NamedTuple):
+    number: int
+    attrs: str
+    cells: list[_Cell]
+
+
+class InvoiceTemplate:
+    """
+    The unpacked invoice in static/gelv/xlsx/invoice, compiled once per process
+    into static parts, a product row pattern and the rows around it.
+    Rendering only joins strings and zips them, without openpyxl.
+
+    The skeleton is a rendered invoice with `sample_rows` product rows starting at `product_row`;
+    cells listed in `fields` are its placeholders (in skeleton coordinates).
+    """
+    product_row = 22
+    sample_rows = 2
+    fields = {
+        'number': 'B1',
+        'date': 'B2',
+        'name': 'B15',
+        'personal_code': 'B16',
+        'address': 'B17',
+        'billing_email': 'B18',
+        'phone': 'B19',
+        'email': 'D19',
+        'total': 'E25',
+        'total_words': 'B27',
+    }
+
+    sheet_path = 'xl/worksheets/sheet1.xml'
+    sheet_rels_path = 'xl/worksheets/_rels/sheet1.xml.rels'
+    strings_path = 'xl/sharedStrings.xml'
+
+    row_pattern = re.compile(r'<row r="(\d+)"([^>]*?)(?:/>|>(.*?)</row>)', re.S)
+    cell_pattern = re.compile(r'<c r="([A-Z]+)\d+"([^>]*?)(?:/>|>(.*?)</c>)', re.S)
+    attr_pattern = re.compile(r'(\w+)="([^"]*)"')
+    merge_pattern = re.compile(r'<mergeCell ref="([A-Z]+)(\d+):([A-Z]+)(\d+)"/>')
+
+    def __init__(self, directory: Path) -> None:
+        self.parts: dict[str, bytes] = {
+            path.relative_to(directory).as_posix(): path.read_bytes()
+            for path in sorted(directory.rglob('*')) if path.is_file()
+        }
+        sheet = self.parts.pop(self.sheet_path).decode()
+        strings = re.findall(r'<si>(.*?)</si>', self.parts.pop(self.strings_path).decode(), re.S)
+        # the e-mail cells link to the sample customer's address
+        self.sheet_rels = re.sub(r'Target="mailto:[^"]*"', 'Target="{mailto}"', self.parts.pop(self.sheet_rels_path).decode())
+
+        data_start, data_end = sheet.index('<sheetData>'), sheet.index('</sheetData>')
+        self.sheet_head = sheet[:data_start]
+        tail = sheet[data_end + len('</sheetData>'):]
+        merges = re.search(r'<mergeCells[^>]*>.*?</mergeCells>', tail, re.S)
+        self.sheet_tail = (tail[:merges.start()], tail[merges.end():]) if merges else (tail, '')
+        self.merges = [
+            (c1, int(r1), c2, int(r2)) for c1, r1, c2, r2 in self.merge_pattern.findall(merges.group(0) if merges else '')
+        ]
+
+        rows = [self._parse_row(m) for m in self.row_pattern.finditer(sheet[data_start:data_end])]
+        placeholders = set(self.fields.values())
+        first_after = self.product_row + self.sample_rows
+        self.head = [row for row in rows if row.number < self.product_row]
+        self.product = next(row for row in rows if row.number == self.product_row)
+        self.tail = [row for row in rows if row.number >= first_after]
+
+        # keep only the shared strings static cells still use (as <si> elements), renumbered from 0
+        self.strings: list[str] = []
+        remap: dict[str, str] = {}
+
+        def compact(row: _Row) -> _Row:
+            cells = []
+            for cell in row.cells:
+                if f'{cell.column}{row.number}' in placeholders:
+                    cell = cell._replace(type=None, value=None)
+                elif cell.type == 's' and cell.value is not None:
+                    if cell.value not in remap:
+                        remap[cell.value] = str(len(self.strings))
+                        self.strings.append(f'<si>{strings[int(cell.value)]}</si>')
+                    cell = cell._replace(value=remap[cell.value])
+                cells.append(cell)
+            return row._replace(cells=cells)
+
+        self.head = [compact(row) for row in self.head]
+        self.tail = [compact(row) for row in self.tail]
+        self.product = self.product._replace(cells=[c._replace(type=None, value=None) for c in self.product.cells])
+
+    def _parse_row(self, match: re.Match) -> _Row:
+        number, attrs, body = match.groups()
+        cells = []
+        for column, cell_attrs, inner in self.cell_pattern.findall(body or ''):
+            parsed = dict(self.attr_pattern.findall(cell_attrs))
+            value = re.search(r'<v>(.*?)</v>', inner or '')
+            cells.append(_Cell(column, parsed.get('s'), parsed.get('t'), value.group(1) if value else None))
+        return _Row(int(number), attrs, cells)
+
+    @staticmethod
+    def _render_row(row: _Row, number: int, values: dict[str, tuple[Optional[str], str]]) -> str:
+        """Render a row at a given number; `values` maps columns to (type, <v> contents)."""
+        cells = []
+        for cell in row.cells:
+            cell_type, value = values.get(cell.column, (cell.type, cell.value))
+            style = f' s="{cell.style}"' if cell.style is not None else ''
+            type_attr = f' t="{cell_type}"' if cell_type else ''
+            if value is None:
+                cells.append(f'<c r="{cell.column}{number}"{style}{type_attr}/>')
+            else:
+                cells.append(f'<c r="{cell.column}{number}"{style}{type_attr}><v>{value}</v></c>')
+        return f'<row r="{number}"{row.attrs}>{"".join(cells)}</row>'
+
+    def render(self, fields: dict[str, str], products: list[tuple[str, str, str, float]]) -> BytesIO:
+        """
+        Render an invoice from its field values and (name, amount, price, sum) product rows.
+        """
+        strings = list(self.strings)
+
+        def string(text: str) -> tuple[str, str]:
+            strings.append(f'<si><t xml:space="preserve">{escape(text)}</t></si>')
+            return 's', str(len(strings) - 1)
+
+        placeholders: dict[int, dict[str, tuple[Optional[str], str]]] = {}
+        for field, ref in self.fields.items():
+            column, number = re.match(r'([A-Z]+)(\d+)', ref).groups()  # type: ignore[union-attr]
+            placeholders.setdefault(int(number), {})[column] = string(fields[field])
+
+        shift = len(products) - self.sample_rows
+        rows = [self._render_row(row, row.number, placeholders.get(row.number, {})) for row in self.head]
+        for ix, (name, amount, price, line_total) in enumerate(products):
+            rows.append(self._render_row(self.product, self.product_row + ix, {
+                'A': string(name), 'C': string(amount), 'D': string(price), 'E': (None, format(line_total, 'g')),
+            }))
+        rows += [self._render_row(row, row.number + shift, placeholders.get(row.number, {})) for row in self.tail]
+
+        merges = []
+        for c1, r1, c2, r2 in self.merges:
+            if r1 < self.product_row:
+                merges.append((c1, r1, c2, r2))
+            elif r1 == self.product_row:
+                merges += [(c1, self.product_row + ix, c2, self.product_row + ix) for ix in range(len(products))]
+            elif r1 >= self.product_row + self.sample_rows:
+                merges.append((c1, r1 + shift, c2, r2 + shift))
+        merge_xml = f'<mergeCells count="{len(merges)}">' + ''.join(
+            f'<mergeCell ref="{c1}{r1}:{c2}{r2}"/>' for c1, r1, c2, r2 in merges
+        ) + '</mergeCells>' if merges else ''
+
+        sheet = ''.join((
+            self.sheet_head, '<sheetData>', *rows, '</sheetData>', self.sheet_tail[0], merge_xml, self.sheet_tail[1]
+        ))
+        shared = ''.join((
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>',
+            '<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" ',
+            f'count="{len(strings)}" uniqueCount="{len(strings)}">',
+            *strings,
+            '</sst>',
+        ))
+
+        buffer = BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr('[Content_Types].xml', self.parts['[Content_Types].xml'])
+            for path, content in self.parts.items():
+                if path != '[Content_Types].xml':
+                    archive.writestr(path, content)
+            archive.writestr(self.sheet_path, sheet)
+            archive.writestr(self.sheet_rels_path, self.sheet_rels.replace(
+                '{mailto}', escape(f"mailto:{fields['billing_email']}", {'"': '&quot;'})
+            ))
+            archive.writestr(self.strings_path, shared)
+        buffer.seek(0)
+        return buffer
+
+
+@cache
+def get_invoice_template() -> InvoiceTemplate:
+    return InvoiceTemplate(XLSX_DIR / 'invoice')
+
+
+@cache
+def _product_row_sheet():
+    return xl.open(XLSX_DIR / 'product_row.xlsx')['product']
+
 
 class Invoice:
     """
@@ -24,6 +222,14 @@ class Invoice:
     def filename(self) -> str:
         return f'{self.number}.xlsx'
 
+    @property
+    def orders(self) -> list[AbstractOrder]:
+        """Orders in invoice row order."""
+        orders = list(self.payment.issueorder_set.select_related('product__journal')) + \
+            list(self.payment.subscriptionorder_set.select_related('product__journal'))
+        # rows used to be inserted one by one above each other, so the last order comes first
+        return orders[::-1]
+
     @staticmethod
     def _copy_cell(src: xl.cell.Cell, dest: xl.cell.Cell, value: Optional[str] = None) -> None:
         if value:
@@ -40,10 +246,46 @@ class Invoice:
             dest.protection = copy(src.protection)  # type: ignore
             dest.alignment = copy(src.alignment)  # type: ignore
 
+    @timed_function('invoice')
+    @metrics.invoice_seconds.time()
     def generate(self) -> BytesIO:
-        product_ws = xl.open('gelv/static/gelv/xlsx/product_row.xlsx')['product']
+        """
+        Render the invoice from the precompiled XML template,
+        falling back to openpyxl if the template is unavailable or disabled.
+        """
+        if getattr(settings, 'INVOICE_ENGINE', 'template') == 'template':
+            try:
+                template = get_invoice_template()
+            except (OSError, ValueError, StopIteration) as e:
+                trace(e, 'invoice template unavailable, falling back to openpyxl', level=logging.WARNING)
+            else:
+                return self.generate_from_template(template)
+        return self.generate_openpyxl()
+
+    def generate_from_template(self, template: InvoiceTemplate) -> BytesIO:
+        total = self.payment.total
+        fields = {
+            'number': self.number,
+            'date': format(date.today(), '%d.%m.%Y'),
+            'name': self.payment.name,
+            'personal_code': self.payment.personal_code,
+            'address': self.payment.address,
+            'billing_email': self.payment.billing_email,
+            'phone': self.payment.phone,
+            'email': self.payment.billing_email,
+            'total': format(total, '.2f'),
+            'total_words': verbalize_price(total),
+        }
+        products = [
+            (str(order), str(amount := getattr(order, 'amount', 1)), format(order.price, '.2f'), amount * order.price)
+            for order in self.orders
+        ]
+        return template.render(fields, products)
+
+    def generate_openpyxl(self) -> BytesIO:
+        product_ws = _product_row_sheet()
 
-        wb = xl.open('gelv/static/gelv/xlsx/invoice.xlsx')
+        wb = xl.open(XLSX_DIR / 'invoice.xlsx')
         ws = wb['invoice']
         ws['B1'] = self.number
         ws['B2'] = format(date.today(), '%d.%m.%Y')
@@ -53,13 +295,14 @@ class Invoice:
         ws['B17'] = self.payment.address
         ws['B18'] = self.payment.billing_email
         ws['B19'] = self.payment.phone
-        ws['D19'] = self.payment.billing_email  # TODO: find out whether this is right
+        ws['D19'] = self.payment.billing_email
 
-        ws['E23'] = format(self.payment.total_price, '.2f')
-        ws['B25'] = verbalize_price(self.payment.total_price)
+        total = self.payment.total
+        ws['E23'] = format(total, '.2f')
+        ws['B25'] = verbalize_price(total)
 
         order: AbstractOrder
-        for order in list(self.payment.issueorder_set.all()) + list(self.payment.subscriptionorder_set.all()):
+        for order in self.orders[::-1]:
             ws.insert_rows(22)
             for src_ix, ref_ix, value in zip(
                 ('A1', 'B1', 'C1', 'D1', 'E1'),
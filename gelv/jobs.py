@@ -0,0 +1,103 @@
+import logging
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from typing import Any, Callable, Optional
+from gelv.models import Job
+from gelv.utils import trace
+
+Handler = Callable[..., Any]
+
+_handlers: dict[str, Handler] = {}
+
+
+def job(name: str) -> Callable[[Handler], Handler]:
+    """Register a function as the handler of jobs with the given name."""
+    def register(handler: Handler) -> Handler:
+        _handlers[name] = handler
+        return handler
+    return register
+
+
+def enqueue(name: str, **payload) -> Optional[Job]:
+    """
+    Queue a job. With settings.JOBS_EAGER it runs right away instead,
+    which is handy in development without a worker.
+    """
+    if name not in _handlers:
+        raise KeyError(f'no job handler registered for {name}')
+    if getattr(settings, 'JOBS_EAGER', False):
+        _handlers[name](**payload)
+        return None
+    return Job.objects.create(name=name, payload=payload)
+
+
+def enqueue_on_commit(name: str, **payload) -> None:
+    """Queue a job once the current transaction commits, so it never sees uncommitted rows."""
+    transaction.on_commit(lambda: enqueue(name, **payload))
+
+
+def backoff(attempts: int) -> timedelta:
+    """Delay before retrying a job that failed `attempts` times: exponential, capped."""
+    base = getattr(settings, 'JOBS_RETRY_BASE', 30)
+    cap = getattr(settings, 'JOBS_RETRY_CAP', 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def claim() -> Optional[Job]:
+    """
+    Atomically take the next due job. Jobs left running by a crashed worker
+    are taken again after settings.JOBS_LOCK_TIMEOUT seconds.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=getattr(settings, 'JOBS_LOCK_TIMEOUT', 600))
+    due = Q(status=Job.PENDING, run_at__lte=now) | Q(status=Job.RUNNING, locked_at__lt=stale)
+    for candidate in Job.objects.filter(due).order_by('run_at').values('id', 'status', 'locked_at')[:10]:
+        taken = Job.objects.filter(
+            id=candidate['id'], status=candidate['status'], locked_at=candidate['locked_at']
+        ).update(status=Job.RUNNING, locked_at=now)
+        if taken:
+            return Job.objects.get(id=candidate['id'])
+    return None
+
+
+def run(job: Job) -> bool:
+    """Run a claimed job, scheduling a retry with backoff if it fails."""
+    job.attempts += 1
+    try:
+        _handlers[job.name](**job.payload)
+    except Exception as e:
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            job.finished = timezone.now()
+        else:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + backoff(job.attempts)
+        job.locked_at = None
+        job.save(update_fields=['attempts', 'status', 'run_at', 'locked_at', 'finished', 'last_error'])
+        trace(e, 'job failed', level=logging.WARNING, job=job.id, job_name=job.name, attempt=job.attempts)
+        return False
+
+    job.status = Job.DONE
+    job.finished = timezone.now()
+    job.locked_at = None
+    job.save(update_fields=['attempts', 'status', 'locked_at', 'finished'])
+    return True
+
+
+def run_pending(limit: Optional[int] = None) -> tuple[int, int]:
+    """Run due jobs until none are left (or `limit` ran). Returns (succeeded, failed)."""
+    succeeded = failed = 0
+    while limit is None or succeeded + failed < limit:
+        job = claim()
+        if job is None:
+            break
+        if run(job):
+            succeeded += 1
+        else:
+            failed += 1
+    return succeeded, failed
@@ -0,0 +1,324 @@
+import fnmatch
+import json
+import logging
+import platform
+import re
+import statistics
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, NamedTuple, Optional
+import django
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils.http import urlencode
+from gelv import tracing
+from gelv.cart import Cart
+from gelv.cart_store import CookieCartStore, get_cart_store
+from gelv.invoice import Invoice
+from gelv.models import Entitlement, Issue, IssueOrder, Journal, Payment, Subscription, SubscriptionOrder, User
+from gelv.views.cart import BILLING_DETAILS_FIELDS
+
+CURSOR_PATTERN = re.compile(r'cursor=([^"&\s]+)')
+
+
+class Case(NamedTuple):
+    """
+    A measured operation. `prepare` runs once, untimed, and returns the call to measure;
+    `before_each` runs untimed before every call.
+    """
+    name: str
+    prepare: Callable[[], Callable[[], Any]]
+    before_each: Optional[Callable[[], None]] = None
+
+
+class Rollback(Exception):
+    pass
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    """Linear interpolation between the closest ranks, like statistics.quantiles(method='inclusive')."""
+    position = (len(sorted_values) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(sorted_values) - 1)
+    return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (position - low)
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the hot paths (catalogue, owned page, downloads, cart, checkout, invoices, ownership) '
+        'against the current database, e.g. one filled by generate_load_data. '
+        'Writes latency percentiles, query counts and peak memory to JSON; --compare flags regressions.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=30, help='timed calls per case')
+        parser.add_argument('--warmup', type=int, default=3, help='untimed calls per case before measuring')
+        parser.add_argument('--only', action='append', default=[], help='case name pattern, e.g. "catalogue*" (repeatable)')
+        parser.add_argument('--cold', action='store_true', help='clear the cache before every call')
+        parser.add_argument('--search', default='nodokļi', help='catalogue search term')
+        parser.add_argument('--output', type=Path, default=Path('bench.json'), help='where to write the results')
+        parser.add_argument('--compare', type=Path, help='baseline results to compare against')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='relative slowdown (p50 or p95) or memory growth counted as a regression')
+        parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                            help='ignore slowdowns smaller than this, which are noise')
+
+    def handle(self, *args, **options):
+        heavy_id = (
+            Entitlement.objects.values('user').annotate(issues=Count('id')).order_by('-issues', 'user')
+            .values_list('user', flat=True).first()
+        )
+        if heavy_id is None or not Journal.objects.exists():
+            raise CommandError('No data to benchmark against; run `manage.py generate_load_data` first.')
+        if settings.DEBUG:
+            self.stderr.write('DEBUG is on: every query is also logged in memory, so results will be pessimistic.')
+
+        self.options = options
+        self.heavy = User.objects.get(id=heavy_id)
+        self.client = Client()
+        self.client.force_login(self.heavy)
+
+        cases = [case for case in self.cases()
+                 if not options['only'] or any(fnmatch.fnmatch(case.name, pattern) for pattern in options['only'])]
+        if not cases:
+            raise CommandError('No case matches --only.')
+
+        # measure what production runs: debug traces off, no mail actually sent
+        logger = tracing.logger
+        level = logger.level
+        logger.setLevel(max(level, logging.INFO))
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'],
+                                   EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+                results = {case.name: self.measure(case) for case in cases}
+        finally:
+            logger.setLevel(level)
+
+        report = {'meta': self.meta(), 'cases': results}
+        options['output'].write_text(json.dumps(report, indent=2, ensure_ascii=False) + '\n')
+        self.stdout.write(f'Results written to {options["output"]}.')
+
+        if options['compare']:
+            self.compare(json.loads(options['compare'].read_text()), report)
+
+    def meta(self) -> dict[str, Any]:
+        return {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'cache': settings.CACHES['default']['BACKEND'],
+            'iterations': self.options['iterations'],
+            'cold': self.options['cold'],
+            'dataset': {
+                'users': User.objects.count(),
+                'issues': Issue.objects.count(),
+                'payments': Payment.objects.count(),
+                'issue_orders': IssueOrder.objects.count(),
+                'subscription_orders': SubscriptionOrder.objects.count(),
+                'entitlements': Entitlement.objects.count(),
+                'heavy_user_issues': Entitlement.objects.filter(user=self.heavy).count(),
+            },
+        }
+
+    def measure(self, case: Case) -> dict[str, Any]:
+        """
+        Time a case, then count the queries and trace the peak memory of one more call each
+        (neither instrument slows down the timed calls). Writes made by the case are rolled back.
+        """
+        options = self.options
+        timings: list[float] = []
+        try:
+            with transaction.atomic():
+                call = case.prepare()
+
+                def run() -> None:
+                    if case.before_each:
+                        case.before_each()
+                    if options['cold']:
+                        cache.clear()
+
+                for _ in range(options['warmup']):
+                    run()
+                    call()
+                for _ in range(options['iterations']):
+                    run()
+                    started = time.perf_counter()
+                    call()
+                    timings.append(time.perf_counter() - started)
+
+                queries = 0
+
+                def count_query(execute, sql, params, many, context):
+                    nonlocal queries
+                    queries += 1
+                    return execute(sql, params, many, context)
+
+                run()
+                with connection.execute_wrapper(count_query):
+                    call()
+                run()
+                tracemalloc.start()
+                try:
+                    call()
+                    peak = tracemalloc.get_traced_memory()[1]
+                finally:
+                    tracemalloc.stop()
+                raise Rollback
+        except Rollback:
+            pass
+
+        timings.sort()
+        result = {
+            'iterations': len(timings),
+            'min_ms': timings[0] * 1000,
+            'mean_ms': statistics.fmean(timings) * 1000,
+            'p50_ms': percentile(timings, 0.50) * 1000,
+            'p95_ms': percentile(timings, 0.95) * 1000,
+            'p99_ms': percentile(timings, 0.99) * 1000,
+            'queries': queries,
+            'peak_kb': peak / 1024,
+        }
+        self.stdout.write(
+            f'{case.name:<36} p50 {result["p50_ms"]:8.2f}ms  p95 {result["p95_ms"]:8.2f}ms  '
+            f'p99 {result["p99_ms"]:8.2f}ms  {result["queries"]:4d} queries  {result["peak_kb"]:9.1f} KiB'
+        )
+        return result
+
+    def compare(self, baseline: dict[str, Any], report: dict[str, Any]) -> None:
+        threshold, min_delta = self.options['threshold'], self.options['min_delta_ms']
+        regressions = []
+        for name, current in report['cases'].items():
+            base = baseline.get('cases', {}).get(name)
+            if base is None:
+                self.stdout.write(f'{name}: not in the baseline')
+                continue
+            problems = []
+            for key in ('p50_ms', 'p95_ms'):
+                if current[key] > base[key] * (1 + threshold) and current[key] - base[key] >= min_delta:
+                    problems.append(f'{key[:3]} {base[key]:.2f} -> {current[key]:.2f}ms')
+            if current['queries'] > base['queries']:
+                problems.append(f'queries {base["queries"]} -> {current["queries"]}')
+            if current['peak_kb'] > base['peak_kb'] * (1 + threshold) and current['peak_kb'] - base['peak_kb'] >= 64:
+                problems.append(f'memory {base["peak_kb"]:.0f} -> {current["peak_kb"]:.0f} KiB')
+            if problems:
+                regressions.append(name)
+                self.stdout.write(self.style.ERROR(f'{name}: {"; ".join(problems)}'))
+            else:
+                self.stdout.write(f'{name}: p50 {base["p50_ms"]:.2f} -> {current["p50_ms"]:.2f}ms, ok')
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions against {self.options["compare"]}.')
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
+
+    # cases
+
+    def get(self, url: str, method: str = 'get') -> Callable[[], Any]:
+        def call():
+            response = getattr(self.client, method)(url)
+            if response.status_code >= 400:
+                raise CommandError(f'{method.upper()} {url} answered {response.status_code}')
+            if response.streaming:
+                # draining it lets the test client close it without closing the database connection
+                for _ in response.streaming_content:
+                    pass
+        return call
+
+    def drop_messages(self) -> None:
+        """Forget flash messages (e.g. of refused downloads), which would otherwise pile up in the cookie."""
+        self.client.cookies.pop('messages', None)
+
+    def deep_catalogue_url(self, pages: int = 25) -> str:
+        """The catalogue page `pages` pages in, reached through the next links like a visitor would."""
+        if getattr(settings, 'PAGINATION_MODE', 'keyset') != 'keyset':
+            return f'{reverse("catalogue")}?page={pages}'
+        url = reverse('catalogue')
+        for _ in range(pages):
+            cursors = CURSOR_PATTERN.findall(self.client.get(url).content.decode())
+            if not cursors:
+                break
+            url = f'{reverse("catalogue")}?cursor={cursors[-1]}'
+        return url
+
+    def cart_raw(self, size: int) -> Cart.Raw:
+        """A cart of mostly issues and some subscriptions, none of them owned by the heavy user."""
+        subscriptions = list(Subscription.objects.order_by('id').values_list('id', flat=True)[:max(size // 5, 0)])
+        issues = list(
+            Issue.objects.exclude(entitlement__user=self.heavy).order_by('-id')
+            .values_list('id', flat=True)[:size - len(subscriptions)]
+        )
+        return [
+            *({'type': 'issue', 'id': pk, 'metadata': {}} for pk in issues),
+            *({'type': 'subscription', 'id': pk, 'metadata': {}} for pk in subscriptions),
+        ]
+
+    def set_cart(self, raw: Cart.Raw) -> None:
+        store = get_cart_store()
+        if isinstance(store, CookieCartStore):
+            signer = signing.get_cookie_signer(salt=store.cookie_name + store.salt)
+            self.client.cookies[store.cookie_name] = signer.sign(store.encode(raw))
+        else:
+            session = self.client.session
+            session['cart'] = raw
+            session.save()
+
+    def hydrate(self, size: int) -> Callable[[], Any]:
+        raw = self.cart_raw(size)
+        return lambda: Cart(raw)
+
+    def checkout(self) -> Callable[[], Any]:
+        data = {'payment_method': 'bank_transfer', 'email': self.heavy.email,
+                **{field['id']: 'bench' for field in BILLING_DETAILS_FIELDS}}
+        data['billing_email'] = self.heavy.email
+
+        def call():
+            response = self.client.post(reverse('checkout'), data)
+            if response.status_code != 302 or response.url != reverse('home'):
+                raise CommandError(f'checkout failed: {response.status_code} {response.get("Location")}')
+        return call
+
+    def invoice(self, rows: int) -> Callable[[], Any]:
+        issues = list(Issue.objects.select_related('journal').order_by('id')[:rows])
+        if len(issues) < rows:
+            raise CommandError(f'an invoice of {rows} rows needs at least {rows} issues')
+        payment = Payment.objects.create(user=self.heavy, name='bench', billing_email=self.heavy.email)
+        IssueOrder.objects.bulk_create(IssueOrder(product=issue, payment=payment, price=issue.price) for issue in issues)
+        payment.update_totals()
+        return lambda: Invoice(payment).generate()
+
+    def cases(self) -> list[Case]:
+        catalogue = reverse('catalogue')
+        journal = Journal.objects.order_by('id').first()
+        owned = Entitlement.objects.filter(user=self.heavy).order_by('issue').values_list('issue', flat=True).first()
+        unowned = Issue.objects.exclude(entitlement__user=self.heavy).order_by('id').values_list('id', flat=True).first()
+
+        checkout_cart = Cart(self.cart_raw(5)).raw  # with the default subscription starts filled in
+
+        cases = [
+            Case('catalogue', lambda: self.get(catalogue)),
+            Case('catalogue_search', lambda: self.get(f'{catalogue}?{urlencode({"search": self.options["search"]})}')),
+            Case('catalogue_filter', lambda: self.get(f'{catalogue}?journal={journal.id}&sort=price_low')),
+            Case('catalogue_deep_page', lambda: self.get(self.deep_catalogue_url())),
+            Case('owned_view', lambda: self.get(reverse('owned'))),
+            # HEAD runs the ownership check and conditional logic without streaming the file
+            Case('download_owned', lambda: self.get(reverse('download', args=[owned]), 'head')),
+        ]
+        if unowned is not None:
+            cases.append(Case('download_not_owned', lambda: self.get(reverse('download', args=[unowned]), 'head'),
+                              self.drop_messages))
+        cases += [
+            Case('get_owned_issues_heavy', lambda: lambda: list(self.heavy.get_owned_issues())),
+            Case('process_payment', self.checkout, lambda: (self.drop_messages(), self.set_cart(checkout_cart))),
+        ]
+        for size in (1, 10, 50):
+            cases.append(Case(f'cart_hydration_{size}', lambda size=size: self.hydrate(size)))
+        for rows in (1, 50, 500):
+            cases.append(Case(f'invoice_generate_{rows}', lambda rows=rows: self.invoice(rows)))
+        return cases
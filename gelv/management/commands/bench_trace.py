@@ -0,0 +1,51 @@
+import logging
+import timeit
+from django.core.management.base import BaseCommand, CommandError
+from gelv import tracing
+
+
+class Command(BaseCommand):
+    help = 'Micro-benchmark gelv.tracing.trace: per-call cost when disabled, unsampled and enabled.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--number', type=int, default=200000, help='calls per measurement')
+        parser.add_argument('--max-overhead', type=float, default=None,
+                            help='fail if a disabled trace costs more than this many ns over a plain call')
+
+    def handle(self, *args, **options):
+        number = options['number']
+        value = {'a': list(range(100))}  # formatting this would be measurable
+
+        def identity(x, comment='trace'):
+            return x
+
+        def measure(fn) -> float:
+            """Best of five runs, in ns per call."""
+            return min(timeit.repeat(lambda: fn(value, 'comment'), number=number, repeat=5)) / number * 1e9
+
+        logger = tracing.logger
+        saved = logger.level, logger.handlers, logger.propagate
+        try:
+            logger.handlers, logger.propagate = [logging.NullHandler()], False
+            baseline = measure(identity)
+
+            logger.setLevel(logging.INFO)
+            disabled = measure(tracing.trace)
+
+            logger.setLevel(logging.DEBUG)
+            token = tracing.sampled.set(False)
+            unsampled = measure(tracing.trace)
+            tracing.sampled.reset(token)
+
+            enabled = measure(tracing.trace)
+        finally:
+            logger.handlers, logger.propagate = saved[1:]
+            logger.setLevel(saved[0])
+
+        for name, ns in (('plain call', baseline), ('disabled', disabled), ('unsampled', unsampled),
+                         ('enabled (null handler)', enabled)):
+            self.stdout.write(f'{name:>24}: {ns:8.1f} ns/call')
+        overhead = disabled - baseline
+        self.stdout.write(f'disabled overhead: {overhead:.1f} ns/call')
+        if options['max_overhead'] is not None and overhead > options['max_overhead']:
+            raise CommandError(f'disabled tracing costs {overhead:.1f} ns over a plain call')
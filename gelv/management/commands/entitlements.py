@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+from gelv.models import User
+from gelv import entitlements
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the entitlement store against the order tables.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=('rebuild', 'verify'))
+        parser.add_argument('--user', action='append', default=[], help='email of a user to process (repeatable)')
+
+    def handle(self, *args, **options):
+        if options['user']:
+            users = User.objects.filter(email__in=options['user'])
+        else:
+            users = entitlements.affected_users()
+
+        if options['action'] == 'rebuild':
+            granted = revoked = 0
+            for user_id in users.values_list('id', flat=True).iterator():
+                g, r = entitlements.sync_user(user_id)
+                granted += g
+                revoked += r
+            self.stdout.write(self.style.SUCCESS(f'{granted} entitlements granted, {revoked} revoked.'))
+
+        else:
+            inconsistent = 0
+            for user in users.iterator():
+                missing, stale = entitlements.diff_user(user.id)
+                if missing or stale:
+                    inconsistent += 1
+                    self.stdout.write(f'{user}: missing {sorted(missing)}, stale {sorted(stale)}')
+            if inconsistent:
+                raise CommandError(f'{inconsistent} users have inconsistent entitlements; run `entitlements rebuild`.')
+            self.stdout.write(self.style.SUCCESS('Entitlements are consistent.'))
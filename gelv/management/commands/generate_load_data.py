@@ -0,0 +1,257 @@
+import random
+import time
+from datetime import date, timedelta
+from io import BytesIO
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+from gelv.caching import bump_version
+from gelv.models import (Ad, Entitlement, Issue, IssueOrder, Journal, Payment, Post, Subscription,
+                         SubscriptionOrder, User)
+from gelv.search import get_backend
+from gelv.utils import IssueNumber, file_digest
+
+EDITIONS = (
+    'Buhgalterija un ekonomika',
+    'Buhgalterija un ekonomika (krievu val.)',
+    'Grāmatvedības Prakse',
+    'Grāmatvedības Prakse (krievu val.)',
+)
+DURATIONS = {3: 14.0, 6: 26.0, 12: 48.0}
+FIRST_NAMES = ('Anna', 'Jānis', 'Elena', 'Andris', 'Olga', 'Pēteris', 'Irina', 'Kristīne', 'Sergejs', 'Laura')
+LAST_NAMES = ('Bērziņa', 'Ozols', 'Ivanova', 'Kalniņš', 'Petrova', 'Liepa', 'Smirnovs', 'Kļaviņa', 'Zariņš')
+CITIES = ('Rīga', 'Daugavpils', 'Liepāja', 'Jelgava', 'Jūrmala', 'Ventspils', 'Rēzekne', 'Valmiera')
+STREETS = ('Brīvības iela', 'Lāčplēša iela', 'Elizabetes iela', 'Krišjāņa Barona iela', 'Tērbatas iela')
+WORDS = ('nodokļi', 'grāmatvedība', 'PVN', 'darba alga', 'pārskats', 'likums', 'atvaļinājums', 'uzņēmums',
+         'dividendes', 'inventarizācija', 'kase', 'amortizācija', 'budžets', 'audits', 'deklarācija')
+SAMPLE_FILE = 'issues/load-sample.pdf'
+SAMPLE_AD = 'ads/load-sample.png'
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill an empty database with a large, reproducible dataset for benchmarks: '
+        'four editions since 2010, users, payments in mixed states, overlapping subscriptions, posts and ads.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=2010, help='the same seed and sizes give the same data')
+        parser.add_argument('--users', type=int, default=200000)
+        parser.add_argument('--payments-per-user', type=float, default=4.0,
+                            help='mean number of payments of an ordinary user')
+        parser.add_argument('--heavy-share', type=float, default=0.01,
+                            help='share of users renewing subscriptions for years (dozens of payments each)')
+        parser.add_argument('--until', type=int, default=2025, help='last year with published issues')
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--ads', type=int, default=20)
+        parser.add_argument('--file-size', type=int, default=256 * 1024, help='bytes of the shared sample issue file')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='users generated per transaction')
+
+    def handle(self, *args, **options):
+        if Journal.objects.exists() or User.objects.exists():
+            raise CommandError('The database is not empty; run this after a fresh `migrate` on an empty database.')
+        if options['until'] < IssueNumber.anno_year:
+            raise CommandError(f'--until must not be before {IssueNumber.anno_year}.')
+
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        self.first_day = date(IssueNumber.anno_year, 1, 1)
+        self.last_day = date(options['until'], 12, 31)
+        self.last_number = (options['until'] - IssueNumber.anno_year + 1) * 12 - 1
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            self.create_catalogue()
+            self.create_posts_and_ads()
+        self.stdout.write(f'{len(self.issues)} issues, {len(self.subscriptions)} subscriptions, '
+                          f'{options["posts"]} posts, {options["ads"]} ads.')
+
+        self.password = make_password('load-data')  # hashed once: hashing per user would take hours
+        totals = {'users': 0, 'payments': 0, 'orders': 0, 'entitlements': 0}
+        for start in range(0, options['users'], options['chunk_size']):
+            count = min(options['chunk_size'], options['users'] - start)
+            with transaction.atomic():
+                for key, value in self.create_users(start, count).items():
+                    totals[key] += value
+            self.stdout.write(f'{totals["users"]}/{options["users"]} users, {totals["payments"]} payments, '
+                              f'{totals["orders"]} orders, {totals["entitlements"]} entitlements '
+                              f'({time.perf_counter() - started:.0f} s)')
+
+        # bulk inserts skip the signals that maintain these
+        for model in (Journal, Issue, Subscription):
+            bump_version(model)
+        indexed = get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {totals["users"]} users, {totals["payments"]} payments, {totals["orders"]} orders and '
+            f'{totals["entitlements"]} entitlements; indexed {indexed} issues in {time.perf_counter() - started:.0f} s.'
+        ))
+
+    def words(self, count: int) -> str:
+        return ' '.join(self.rng.choice(WORDS) for _ in range(count))
+
+    def sample_file(self) -> tuple[str, dict]:
+        """One shared issue file, stored once, and the metadata Issue.save would have computed for it."""
+        rng = random.Random(self.options['seed'])
+        content = ContentFile(b'%PDF-1.4\n' + rng.randbytes(max(self.options['file_size'] - 9, 0)))
+        if not default_storage.exists(SAMPLE_FILE):
+            default_storage.save(SAMPLE_FILE, content)
+        digest = file_digest(default_storage.open(SAMPLE_FILE))
+        return SAMPLE_FILE, {
+            'file_hash': digest.sha256, 'file_size': digest.size, 'file_crc32': digest.crc32,
+            'file_modified': timezone.now(),
+        }
+
+    def create_catalogue(self) -> None:
+        journals = Journal.objects.bulk_create(
+            Journal(name=name, description=f'{name}: {self.words(12)}') for name in EDITIONS
+        )
+        file, metadata = self.sample_file()
+        issues = []
+        for journal in journals:
+            for number in range(self.last_number + 1):
+                price = self.rng.choice((4.0, 4.5, 5.0))
+                issues.append(Issue(
+                    journal=journal, number=number, description=self.words(self.rng.randint(20, 60)),
+                    price=price, discounted_price=price - 1 if self.rng.random() < 0.05 else None,
+                    file=file, **metadata,
+                ))
+        self.issues = Issue.objects.bulk_create(issues, batch_size=1000)
+        self.issues_by_number = {(issue.journal_id, issue.number): issue for issue in self.issues}
+        self.subscriptions = Subscription.objects.bulk_create(
+            Subscription(journal=journal, duration=duration, price=price)
+            for journal in journals for duration, price in DURATIONS.items()
+        )
+        self.journal_subscriptions = {
+            journal.id: [s for s in self.subscriptions if s.journal_id == journal.id] for journal in journals
+        }
+
+    def create_posts_and_ads(self) -> None:
+        days = (self.last_day - self.first_day).days
+        Post.objects.bulk_create((
+            Post(
+                title=self.words(self.rng.randint(3, 8)).capitalize(),
+                description=self.words(self.rng.randint(15, 30)),
+                text='\n\n'.join(self.words(self.rng.randint(40, 120)) for _ in range(self.rng.randint(2, 8))),
+                date=self.first_day + timedelta(days=self.rng.randint(0, days)),
+            ) for _ in range(self.options['posts'])
+        ), batch_size=1000)
+
+        if self.options['ads'] and not default_storage.exists(SAMPLE_AD):
+            image = BytesIO()
+            Image.new('RGB', (300, 250), (40, 90, 160)).save(image, 'PNG')
+            default_storage.save(SAMPLE_AD, ContentFile(image.getvalue()))
+        Ad.objects.bulk_create(
+            Ad(name=f'Ad {n + 1}', image=SAMPLE_AD, is_active=self.rng.random() < 0.5) for n in range(self.options['ads'])
+        )
+
+    def random_day(self, first: date, last: date) -> date:
+        return first + timedelta(days=self.rng.randint(0, max((last - first).days, 0)))
+
+    def month_number(self, day: date) -> int:
+        return (day.year - IssueNumber.anno_year) * 12 + day.month - 1
+
+    def user_orders(self, heavy: bool) -> list[tuple[date, list[tuple[Issue | Subscription, int | None]]]]:
+        """A user's payments: (date, [(product, subscription start or None)]), oldest first."""
+        rng = self.rng
+        if heavy:
+            # renewals of one to four editions, each starting up to two issues before the last one ended
+            journals = rng.sample(list(self.journal_subscriptions), rng.randint(1, 4))
+            day = self.random_day(self.first_day, self.last_day - timedelta(days=3 * 365))
+            next_start = {journal: self.month_number(day) for journal in journals}
+            payments = []
+            while day <= self.last_day and len(payments) < 80:
+                orders = []
+                for journal in journals:
+                    subscription = rng.choice(self.journal_subscriptions[journal])
+                    start = max(next_start[journal] - rng.randint(0, 2), 0)
+                    next_start[journal] = start + subscription.duration
+                    orders.append((subscription, start))
+                payments.append((day, orders))
+                day += timedelta(days=rng.choice((85, 170, 350)))
+            return payments
+
+        payments = []
+        for _ in range(min(int(rng.expovariate(1 / self.options['payments_per_user'])), 40)):
+            day = self.random_day(self.first_day, self.last_day)
+            published = min(self.month_number(day), self.last_number)
+            orders = []
+            for _ in range(rng.choice((1, 1, 1, 2, 2, 3, 5))):
+                journal = rng.choice(list(self.journal_subscriptions))
+                if rng.random() < 0.4:
+                    subscription = rng.choice(self.journal_subscriptions[journal])
+                    orders.append((subscription, self.month_number(day) + rng.choice((0, 0, 1, 1, 2))))
+                else:
+                    number = rng.randint(max(published - 24, 0), published)
+                    orders.append((self.issues_by_number[journal, number], None))
+            payments.append((day, orders))
+        return sorted(payments, key=lambda payment: payment[0])
+
+    def is_paid(self, day: date) -> bool:
+        # recent payments are often still open; old ones were almost all paid
+        recent = (self.last_day - day).days < 60
+        return self.rng.random() < (0.5 if recent else 0.97)
+
+    def create_users(self, start: int, count: int) -> dict[str, int]:
+        rng = self.rng
+        users = User.objects.bulk_create([
+            User(email=f'user{n}@example.com', password=self.password,
+                 first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES))
+            for n in range(start, start + count)
+        ], batch_size=1000)
+
+        payments, orders, owned = [], [], {}
+        for user in users:
+            name = f'{user.first_name} {user.last_name}'
+            details = {
+                'name': name,
+                'phone': f'2{rng.randint(1000000, 9999999)}',
+                'personal_code': f'{rng.randint(10000, 311299):06d}-{rng.randint(10000, 29999)}',
+                'city': rng.choice(CITIES),
+                'address': f'{rng.choice(STREETS)} {rng.randint(1, 150)}',
+                'postal_code': f'LV-{rng.randint(1001, 5799)}',
+                'billing_email': user.email,
+            }
+            for day, products in self.user_orders(heavy=rng.random() < self.options['heavy_share']):
+                paid = self.is_paid(day)
+                issues = [product for product, start in products if start is None]
+                subscriptions = [(product, start) for product, start in products if start is not None]
+                payment = Payment(
+                    user=user, date=day, paid=paid, **details,
+                    total=sum(product.current_price for product, _ in products),
+                    summary=', '.join(dict.fromkeys(map(str, [*issues, *(s for s, _ in subscriptions)]))),
+                )
+                payments.append(payment)
+                orders.append((payment, issues, subscriptions))
+                if paid:
+                    entitled = owned.setdefault(user.id, set())
+                    entitled.update(issue.id for issue in issues)
+                    for subscription, first in subscriptions:
+                        for number in range(first, first + subscription.duration):
+                            issue = self.issues_by_number.get((subscription.journal_id, number))
+                            if issue is not None:
+                                entitled.add(issue.id)
+
+        Payment.objects.bulk_create(payments, batch_size=1000)
+        issue_orders = [
+            IssueOrder(product=issue, payment=payment, price=issue.current_price)
+            for payment, issues, _ in orders for issue in issues
+        ]
+        subscription_orders = [
+            SubscriptionOrder(product=subscription, payment=payment, price=subscription.current_price, start=first)
+            for payment, _, subscriptions in orders for subscription, first in subscriptions
+        ]
+        IssueOrder.objects.bulk_create(issue_orders, batch_size=2000)
+        SubscriptionOrder.objects.bulk_create(subscription_orders, batch_size=2000)
+        entitlements = [
+            Entitlement(user_id=user_id, issue_id=issue_id)
+            for user_id, issue_ids in owned.items() for issue_id in sorted(issue_ids)
+        ]
+        Entitlement.objects.bulk_create(entitlements, batch_size=5000)
+        return {
+            'users': len(users), 'payments': len(payments),
+            'orders': len(issue_orders) + len(subscription_orders), 'entitlements': len(entitlements),
+        }
@@ -0,0 +1,38 @@
+import time
+from django.core.management.base import BaseCommand
+from gelv import reconcile
+from gelv.tasks import send_payment_confirmations
+
+
+class Command(BaseCommand):
+    help = 'Mark payments paid from a bank statement export (CSV or XLSX), reporting unmatched lines.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('statement', help='path of the statement export')
+        parser.add_argument('--dry-run', action='store_true', help='only report what would be matched')
+        parser.add_argument('--report', help='write unmatched lines to this CSV file instead of stdout')
+        parser.add_argument('--no-mail', action='store_true', help="don't send payment confirmations")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with open(options['statement'], 'rb') as f:
+            result = reconcile.reconcile(reconcile.read_statement(f, options['statement']))
+
+        if not options['dry_run']:
+            payments = reconcile.mark_paid(result.payment_ids)
+            self.stdout.write(f'{len(payments)} payments marked as paid.')
+            if not options['no_mail']:
+                for batch, error in send_payment_confirmations(payments):
+                    if error is not None:
+                        self.stderr.write(f'confirmations failed ({error}) for {", ".join(p.number for p in batch)}')
+
+        if result.unmatched:
+            if options['report']:
+                with open(options['report'], 'w', newline='') as out:
+                    reconcile.write_report(result.unmatched, out)
+            else:
+                reconcile.write_report(result.unmatched, self.stdout)
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(result.matched)} lines matched, {len(result.unmatched)} unmatched '
+            f'in {time.perf_counter() - started:.2f}s.'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from gelv.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the catalogue search index from the issue table.'
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        count = backend.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} issues with {type(backend).__name__}.'))
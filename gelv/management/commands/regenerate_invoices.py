@@ -0,0 +1,156 @@
+import django
+import hashlib
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from pathlib import Path
+from typing import Iterator
+from gelv.invoice import Invoice
+from gelv.models import Payment
+
+
+def regenerate(payment_id: int) -> tuple[int, str, float]:
+    """
+    Render a payment's invoice and atomically replace its file.
+    Runs in worker processes; returns (payment id, storage name, seconds taken).
+    """
+    started = time.perf_counter()
+    payment = Payment.objects.get(id=payment_id)
+    invoice = Invoice(payment)
+    name = payment.invoice.name or Payment._meta.get_field('invoice').generate_filename(payment, invoice.filename)
+    path = default_storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    # write next to the target and rename, so readers never see a half-written invoice
+    with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix='.tmp', delete=False) as f:
+        try:
+            f.write(invoice.generate().getvalue())
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            os.unlink(f.name)
+            raise
+    os.replace(f.name, path)
+    return payment_id, name, time.perf_counter() - started
+
+
+def number_to_id(number: str) -> int:
+    try:
+        return int(number.upper().removeprefix('GK')) - 1000000
+    except ValueError:
+        raise CommandError(f'invalid payment number: {number}')
+
+
+class Command(BaseCommand):
+    help = 'Regenerate invoice files of payments in parallel, e.g. after the invoice template changed.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, help='first payment date (YYYY-MM-DD)')
+        parser.add_argument('--until', type=date.fromisoformat, help='last payment date (YYYY-MM-DD)')
+        paid = parser.add_mutually_exclusive_group()
+        paid.add_argument('--paid', action='store_true', default=None, help='only paid payments')
+        paid.add_argument('--unpaid', dest='paid', action='store_false', help='only unpaid payments')
+        parser.add_argument('--number', action='append', default=[], help='payment number, e.g. GK1000013 (repeatable)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes (1 runs inline)')
+        parser.add_argument('--progress', type=Path,
+                            help='file recording finished payments, so an interrupted run resumes where it stopped '
+                                 '(default: one per database and set of filters, in the temp directory)')
+        parser.add_argument('--restart', action='store_true', help='ignore an existing progress file')
+
+    def handle(self, *args, **options):
+        payments = Payment.objects.order_by('id')
+        if options['since']:
+            payments = payments.filter(date__gte=options['since'])
+        if options['until']:
+            payments = payments.filter(date__lte=options['until'])
+        if options['paid'] is not None:
+            payments = payments.filter(paid=options['paid'])
+        if options['number']:
+            payments = payments.filter(id__in=[number_to_id(n) for n in options['number']])
+
+        progress: Path = options['progress'] or self._default_progress(options)
+        done: set[int] = set()
+        if progress.exists() and not options['restart']:
+            done = {int(line) for line in progress.read_text().split()}
+        elif progress.exists():
+            progress.unlink()
+        ids = [pk for pk in payments.values_list('id', flat=True) if pk not in done]
+        if done:
+            self.stdout.write(f'Resuming from {progress}: {len(done)} invoices already regenerated '
+                              f'(--restart to start over).')
+        if not ids:
+            progress.unlink(missing_ok=True)
+            self.stdout.write('Nothing to regenerate.')
+            return
+
+        latencies: list[float] = []
+        failed: list[tuple[int, Exception]] = []
+        started = time.perf_counter()
+        with progress.open('a') as log:
+            for result in self._run(ids, options['workers']):
+                if isinstance(result[1], Exception):
+                    failed.append(result)  # type: ignore[arg-type]
+                    self.stderr.write(f'{Payment(id=result[0]).number}: {result[1]!r}')
+                    continue
+                payment_id, name, seconds = result
+                # a plain update: the file is all that changed, so no signals (entitlement syncs, mails) should fire
+                Payment.objects.filter(id=payment_id).update(invoice=name)
+                log.write(f'{payment_id}\n')
+                log.flush()
+                latencies.append(seconds)
+        elapsed = time.perf_counter() - started
+
+        if latencies:
+            self.stdout.write(self._report(latencies, elapsed))
+        if failed:
+            raise CommandError(f'{len(failed)} invoices failed; run again to retry them.')
+        progress.unlink()
+        self.stdout.write(self.style.SUCCESS(f'Regenerated {len(latencies)} invoices.'))
+
+    @staticmethod
+    def _default_progress(options) -> Path:
+        """A progress file keyed to the database and the filters, so only the same run resumes from it."""
+        run = [
+            str(settings.DATABASES['default']['NAME']), str(options['since']), str(options['until']),
+            str(options['paid']), *sorted({str(number_to_id(n)) for n in options['number']}),
+        ]
+        key = hashlib.sha256('\0'.join(run).encode()).hexdigest()[:16]
+        return Path(tempfile.gettempdir()) / f'gelv-regenerate_invoices-{key}.progress'
+
+    def _run(self, ids: list[int], workers: int) -> Iterator[tuple]:
+        if workers <= 1:
+            for payment_id in ids:
+                try:
+                    yield regenerate(payment_id)
+                except Exception as e:
+                    yield payment_id, e
+            return
+
+        # forked workers must not share the parent's database connections
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers, initializer=django.setup) as pool:
+            futures = {pool.submit(regenerate, payment_id): payment_id for payment_id in ids}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except Exception as e:
+                    yield futures[future], e
+
+    @staticmethod
+    def _report(latencies: list[float], elapsed: float) -> str:
+        if len(latencies) > 1:
+            percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+            p50, p95, p99 = percentiles[49], percentiles[94], percentiles[98]
+        else:
+            p50 = p95 = p99 = latencies[0]
+        return (
+            f'{len(latencies)} invoices in {elapsed:.2f}s ({len(latencies) / elapsed:.1f}/s); '
+            f'latency p50 {p50 * 1000:.1f}ms, p95 {p95 * 1000:.1f}ms, p99 {p99 * 1000:.1f}ms'
+        )
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from gelv import jobs
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (invoices, emails), retrying failures with backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='run the due jobs and exit')
+        parser.add_argument('--sleep', type=float, default=2.0, help='seconds to wait when the queue is empty')
+        parser.add_argument('--limit', type=int, default=None, help='run at most this many jobs per pass')
+
+    def handle(self, *args, **options):
+        while True:
+            succeeded, failed = jobs.run_pending(limit=options['limit'])
+            if succeeded or failed:
+                self.stdout.write(f'{succeeded} jobs done, {failed} failed.')
+            if options['once']:
+                break
+            if not (succeeded or failed):
+                time.sleep(options['sleep'])
@@ -0,0 +1,226 @@
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from typing import Iterable, Iterator, Optional
+from gelv.tracing import trace
+
+# upper bounds of the latency histogram buckets, in seconds (an unbounded +Inf bucket follows)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = tuple[tuple[str, str], ...]
+Series = tuple[str, Labels]  # sample name and its (label, value) pairs
+
+
+class Store:
+    """
+    This process's samples: counter totals and cumulative histogram buckets, summed in memory.
+    With settings.METRICS_DIR set, they are also written to a file of their own there
+    (at most every settings.METRICS_FLUSH_INTERVAL seconds, on the next update, and at exit),
+    and collect() sums the files of all processes, so any gunicorn worker can answer a scrape.
+    Files of exited workers keep counting, which keeps counters monotonic;
+    empty the directory when the whole server is (re)started.
+    """
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.pid = os.getpid()
+        self.values: dict[Series, float] = {}
+        self.flushed_at = time.monotonic()
+        self.filename = f'{self.pid}-{time.time_ns()}.json'
+
+    @staticmethod
+    def directory() -> Optional[str]:
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def add(self, increments: Iterable[tuple[Series, float]]) -> None:
+        with self.lock:
+            if os.getpid() != self.pid:
+                # a forked worker starts from zero: what it inherited is its parent's to report
+                self._reset()
+            for series, amount in increments:
+                self.values[series] = self.values.get(series, 0.0) + amount
+            due = time.monotonic() - self.flushed_at >= getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+        if due:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write this process's samples to its file, atomically (no-op without settings.METRICS_DIR)."""
+        directory = self.directory()
+        if not directory:
+            return
+        with self.lock:
+            self.flushed_at = time.monotonic()
+            rows = [[name, list(labels), value] for (name, labels), value in self.values.items()]
+            filename = self.filename
+        try:
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, prefix='.', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(rows, f)
+                os.replace(tmp, os.path.join(directory, filename))
+            except BaseException:
+                os.unlink(tmp)
+                raise
+        except OSError as e:
+            trace(e, 'writing metrics failed', level=logging.WARNING, directory=directory)
+
+    def collect(self) -> dict[Series, float]:
+        """The samples of all processes sharing settings.METRICS_DIR (or just this one's), summed."""
+        directory = self.directory()
+        if not directory:
+            with self.lock:
+                return dict(self.values)
+        self.flush()
+        totals: dict[Series, float] = {}
+        for entry in os.scandir(directory) if os.path.isdir(directory) else ():
+            if not entry.name.endswith('.json') or entry.name.startswith('.'):
+                continue
+            try:
+                with open(entry.path) as f:
+                    rows = json.load(f)
+            except (OSError, ValueError) as e:
+                trace(e, 'skipping unreadable metrics file', level=logging.WARNING, file=entry.name)
+                continue
+            for name, labels, value in rows:
+                series = (name, tuple(tuple(pair) for pair in labels))
+                totals[series] = totals.get(series, 0.0) + value
+        return totals
+
+
+store = Store()
+atexit.register(store.flush)
+
+registry: dict[str, 'Metric'] = {}
+
+
+def format_value(value: float) -> str:
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    escaped = (
+        (name, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+class Metric:
+    type = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        registry[name] = self
+
+    def _labels(self, values: dict[str, object]) -> Labels:
+        return tuple((label, str(values[label])) for label in self.labels)
+
+    def samples(self, collected: dict[Series, float]) -> Iterator[tuple[str, Labels, float]]:
+        raise NotImplementedError
+
+    def render(self, collected: dict[Series, float]) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines += [f'{name}{format_labels(labels)} {format_value(value)}'
+                  for name, labels, value in self.samples(collected)]
+        return lines
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels: object) -> None:
+        store.add([((self.name, self._labels(labels)), amount)])
+
+    def samples(self, collected):
+        for (name, labels), value in sorted(collected.items()):
+            if name == self.name:
+                yield name, labels, value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labels)
+        self.buckets = (*buckets, float('inf'))
+
+    def observe(self, value: float, **labels: object) -> None:
+        key = self._labels(labels)
+        increments = [((f'{self.name}_bucket', (*key, ('le', format_value(bound)))), 1)
+                      for bound in self.buckets if value <= bound]
+        increments += [((f'{self.name}_sum', key), value), ((f'{self.name}_count', key), 1)]
+        store.add(increments)
+
+    @contextmanager
+    def time(self, **labels: object) -> Iterator[None]:
+        """Observe the seconds spent in the block (usable as a decorator, too)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self, collected):
+        label_sets = sorted(labels for name, labels in collected if name == f'{self.name}_count')
+        for labels in label_sets:
+            # buckets are cumulative, so one never reached by an observation is simply 0
+            for bound in self.buckets:
+                bucket = (*labels, ('le', format_value(bound)))
+                yield f'{self.name}_bucket', bucket, collected.get((f'{self.name}_bucket', bucket), 0)
+            yield f'{self.name}_sum', labels, collected[(f'{self.name}_sum', labels)]
+            yield f'{self.name}_count', labels, collected[(f'{self.name}_count', labels)]
+
+
+class HitRatio(Metric):
+    """A gauge derived at scrape time from a counter with a `result` label of 'hit' or 'miss'."""
+    type = 'gauge'
+
+    def __init__(self, name: str, documentation: str, counter: Counter) -> None:
+        super().__init__(name, documentation, tuple(label for label in counter.labels if label != 'result'))
+        self.counter = counter
+
+    def samples(self, collected):
+        totals: dict[Labels, list[float]] = {}
+        for (name, labels), value in collected.items():
+            if name == self.counter.name:
+                result = dict(labels)['result']
+                entry = totals.setdefault(tuple(pair for pair in labels if pair[0] != 'result'), [0.0, 0.0])
+                entry[0 if result == 'hit' else 1] += value
+        for labels, (hits, misses) in sorted(totals.items()):
+            if hits + misses:
+                yield self.name, labels, hits / (hits + misses)
+
+
+def render() -> str:
+    """All registered metrics in the Prometheus text exposition format (version 0.0.4)."""
+    collected = store.collect()
+    lines = []
+    for metric in registry.values():
+        lines += metric.render(collected)
+    return '\n'.join(lines) + '\n'
+
+
+checkouts_started = Counter('gelv_checkouts_started_total', 'Checkout form submissions.')
+checkouts_completed = Counter('gelv_checkouts_completed_total', 'Checkouts that created a payment and its orders.')
+invoice_seconds = Histogram('gelv_invoice_generation_seconds', 'Time spent rendering invoice workbooks.')
+emails = Counter('gelv_emails_total', 'Emails sent, by kind and result.', ('kind', 'result'))
+downloads = Counter('gelv_downloads_total', 'Files and bundles handed out, by kind.', ('kind',))
+download_bytes = Counter('gelv_download_bytes_total', 'Bytes of files and bundles handed out, by kind.', ('kind',))
+cart_operations = Counter('gelv_cart_operations_total', 'Cart operations, by action and whether they changed the cart.',
+                          ('action', 'result'))
+cache_lookups = Counter('gelv_cache_lookups_total', 'Cache lookups, by cache and result.', ('cache', 'result'))
+cache_hit_ratio = HitRatio('gelv_cache_hit_ratio', 'Share of cache lookups that hit, by cache.', cache_lookups)
+request_seconds = Histogram('gelv_request_duration_seconds', 'Request latency, by URL name.', ('view',))
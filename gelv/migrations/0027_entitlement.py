@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-17 20:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_entitlements(apps, schema_editor):
+    Issue = apps.get_model('gelv', 'Issue')
+    IssueOrder = apps.get_model('gelv', 'IssueOrder')
+    SubscriptionOrder = apps.get_model('gelv', 'SubscriptionOrder')
+    Entitlement = apps.get_model('gelv', 'Entitlement')
+
+    pairs = set(IssueOrder.objects.filter(payment__paid=True).values_list('payment__user_id', 'product_id'))
+    for order in SubscriptionOrder.objects.filter(payment__paid=True).select_related('payment', 'product'):
+        issue_ids = Issue.objects.filter(
+            journal=order.product.journal_id,
+            number__gte=order.start,
+            number__lt=order.start + order.product.duration,
+        ).values_list('id', flat=True)
+        pairs.update((order.payment.user_id, issue_id) for issue_id in issue_ids)
+
+    Entitlement.objects.bulk_create(
+        [Entitlement(user_id=user_id, issue_id=issue_id) for user_id, issue_id in pairs],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gelv', '0026_payment_comment'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Entitlement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gelv.issue')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'issue'), name='unique_user_issue_entitlement')],
+            },
+        ),
+        migrations.RunPython(populate_entitlements, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    Issue = apps.get_model('gelv', 'Issue')
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS gelv_issue_search "
+        "USING fts5(journal_name, description, tokenize='unicode61 remove_diacritics 2')"
+    )
+    for issue in Issue.objects.select_related('journal').iterator():
+        schema_editor.execute(
+            'INSERT INTO gelv_issue_search (rowid, journal_name, description) VALUES (%s, %s, %s)',
+            (issue.id, issue.journal.name, issue.description or ''),
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS gelv_issue_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gelv', '0027_entitlement'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
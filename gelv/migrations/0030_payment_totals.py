@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-17 21:08
+
+from collections import defaultdict
+from django.db import migrations, models
+
+
+def issue_number(n: int) -> str:
+    """'N/YYYY' of an issue number, as gelv.utils.IssueNumber spelled it when this migration was written."""
+    return f'{1 + n % 12}/{2010 + n // 12}'
+
+
+def populate_totals(apps, schema_editor):
+    Payment = apps.get_model('gelv', 'Payment')
+    IssueOrder = apps.get_model('gelv', 'IssueOrder')
+    SubscriptionOrder = apps.get_model('gelv', 'SubscriptionOrder')
+
+    # historical models have no __str__, so product names are spelled out as in the models
+    totals: dict[int, float] = defaultdict(float)
+    products: dict[int, dict[str, None]] = defaultdict(dict)
+    for order in IssueOrder.objects.select_related('product__journal').order_by('id'):
+        totals[order.payment_id] += order.price
+        products[order.payment_id][f'{order.product.journal.name} {issue_number(order.product.number)}'] = None
+    for order in SubscriptionOrder.objects.select_related('product__journal').order_by('id'):
+        totals[order.payment_id] += order.price
+        products[order.payment_id][f'{order.product.journal.name} \u2014 {order.product.duration}'] = None
+
+    payments = list(Payment.objects.filter(id__in=totals.keys()).only('id'))
+    for payment in payments:
+        payment.total = totals[payment.id]
+        payment.summary = ', '.join(products[payment.id])
+    Payment.objects.bulk_update(payments, ['total', 'summary'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gelv', '0029_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='summary',
+            field=models.TextField(blank=True, default='', verbose_name='products'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='total',
+            field=models.FloatField(default=0, verbose_name='total price'),
+        ),
+        migrations.RunPython(populate_totals, migrations.RunPython.noop),
+    ]
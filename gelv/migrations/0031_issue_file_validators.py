@@ -0,0 +1,56 @@
+# Generated by Django 5.2.4 on 2026-10-17 21:10
+
+import hashlib
+from django.db import migrations, models
+
+
+def file_digest(file) -> tuple[str, int]:
+    """SHA-256 hex digest and size of a file; a frozen copy, as migrations must not follow gelv.utils."""
+    digest, size = hashlib.sha256(), 0
+    file.open('rb')
+    try:
+        for chunk in file.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+    finally:
+        file.close()
+    return digest.hexdigest(), size
+
+
+def populate_file_validators(apps, schema_editor):
+    Issue = apps.get_model('gelv', 'Issue')
+    issues = []
+    for issue in Issue.objects.exclude(file='').only('id', 'file').iterator():
+        try:
+            issue.file_hash, issue.file_size = file_digest(issue.file)
+            issue.file_modified = issue.file.storage.get_modified_time(issue.file.name)
+        except FileNotFoundError:
+            continue
+        issues.append(issue)
+    Issue.objects.bulk_update(issues, ['file_hash', 'file_size', 'file_modified'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gelv', '0030_payment_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='file_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='file_modified',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='issue',
+            name='file_size',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_file_validators, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.4 on 2026-10-17 21:13
+
+import zlib
+from django.db import migrations, models
+
+
+def file_crc32(file) -> int:
+    """CRC-32 of a file; a frozen copy, as migrations must not follow gelv.utils."""
+    crc = 0
+    file.open('rb')
+    try:
+        for chunk in file.chunks():
+            crc = zlib.crc32(chunk, crc)
+    finally:
+        file.close()
+    return crc
+
+
+def populate_file_crc32(apps, schema_editor):
+    Issue = apps.get_model('gelv', 'Issue')
+    issues = []
+    for issue in Issue.objects.exclude(file='').only('id', 'file').iterator():
+        try:
+            issue.file_crc32 = file_crc32(issue.file)
+        except FileNotFoundError:
+            continue
+        issues.append(issue)
+    Issue.objects.bulk_update(issues, ['file_crc32'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gelv', '0031_issue_file_validators'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='issue',
+            name='file_crc32',
+            field=models.PositiveBigIntegerField(editable=False, null=True),
+        ),
+        migrations.RunPython(populate_file_crc32, migrations.RunPython.noop),
+    ]
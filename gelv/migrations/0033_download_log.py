@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-17 21:14
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gelv', '0032_issue_file_crc32'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DownloadEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('single', 'download'), ('signed', 'signed link'), ('bundle', 'bundle')], default='single', max_length=10)),
+                ('created', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gelv.issue')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DownloadRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('issue', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='gelv.issue')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'user', 'issue'), name='unique_download_rollup')],
+            },
+        ),
+    ]
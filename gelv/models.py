@@ -1,12 +1,13 @@
+import logging
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import AbstractUser, BaseUserManager
 from django.core.files.base import ContentFile
 from django.db.models.query import QuerySet
-from typing import TypeVar, cast, Optional, get_args, Generator
+from typing import TypeVar, cast, Optional, get_args, Generator, Iterable
 from django.shortcuts import get_object_or_404
 from django.db.models.manager import Manager
-from gelv.utils import trace, IssueNumber
+from gelv.utils import trace, file_digest, IssueNumber
 
 P = TypeVar('P', bound='AbstractProduct')
 
@@ -61,10 +62,7 @@ class User(AbstractUser):
 
     def get_owned_issues(self) -> QuerySet['Issue']:
         """Get all issues a user owns, including from subscriptions."""
-        issue_orders = IssueOrder.objects.filter(payment__user__id=self.id, payment__paid=True)
-        issues = Issue.get_objects(all=True).filter(issueorder__in=issue_orders).distinct()
-        sub_orders = SubscriptionOrder.objects.filter(payment__user__id=self.id, payment__paid=True)
-        return issues.union(*map(lambda x: x.get_issues(), sub_orders))
+        return Issue.get_objects(all=True).filter(entitlement__user=self.id)
 
     @staticmethod
     def get_by_email(email: str) -> 'User':
@@ -87,10 +85,22 @@ class Journal(models.Model):
 
     @property
     def latest_number(self, all=False) -> int:
+        if '_latest_number' in self.__dict__:
+            return self.__dict__['_latest_number']
         return Issue.objects.filter(journal=self.id).aggregate(
             models.Max('number', output_field=models.IntegerField(), default=0)
         )['number__max']
 
+    @staticmethod
+    def prefetch_latest_numbers(journals: Iterable['Journal']) -> None:
+        """Compute latest_number of many journals with a single grouped aggregate."""
+        journals = list(journals)
+        latest = dict(
+            Issue.objects.filter(journal__in={j.id for j in journals}).values_list('journal').annotate(models.Max('number'))
+        )
+        for journal in journals:
+            journal.__dict__['_latest_number'] = latest.get(journal.id, 0)
+
     def get_subscriptions(self, all=False) -> QuerySet['Subscription', 'Subscription']:
         return Subscription.get_objects(all=all).filter(journal=self.id)
 
@@ -144,11 +154,33 @@ class Issue(AbstractProduct):
     number = IssueNumberField()
     description = models.TextField(default='', blank=True, null=True)
     file = models.FileField(upload_to='issues')
+    # download validators (ETag, Content-Length, Last-Modified), computed once per uploaded file
+    file_hash = models.CharField(max_length=64, default='', blank=True, editable=False)
+    file_size = models.PositiveBigIntegerField(null=True, editable=False)
+    file_modified = models.DateTimeField(null=True, editable=False)
+    file_crc32 = models.PositiveBigIntegerField(null=True, editable=False)  # for streamed zip bundles
+    file_metadata_fields = ('file_hash', 'file_size', 'file_modified', 'file_crc32')
 
     @property
     def number_year(self):
         return IssueNumber(self.number, self.journal.frequency)
 
+    def save(self, *args, **kwargs):
+        # a new upload is not committed to storage yet; files from before the validators get them on the next save
+        if self.file and (not self.file._committed or not self.file_hash or self.file_crc32 is None):
+            self.update_file_metadata()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], *self.file_metadata_fields}
+        super().save(*args, **kwargs)
+
+    def update_file_metadata(self) -> None:
+        try:
+            self.file_hash, self.file_size, self.file_crc32 = file_digest(self.file)
+        except FileNotFoundError as e:
+            trace(e, 'cannot hash issue file', level=logging.WARNING, issue=self.id)
+            return
+        self.file_modified = timezone.now()
+
     def __str__(self):
         return f'{self.journal.name} {str(self.number_year)}'
 
@@ -167,8 +199,9 @@ class Subscription(AbstractProduct):
 
     def get_issues(self, start: int) -> QuerySet[Issue]:
         """Get existing issues included in the subscription from a specific date."""
-        numbers = range(start, start + self.duration)
-        return Issue.get_objects(all=True).filter(journal=self.journal, number__in=numbers)
+        return Issue.get_objects(all=True).filter(
+            journal=self.journal_id, number__gte=start, number__lt=start + self.duration
+        )
 
 
 class Payment(models.Model):
@@ -184,6 +217,10 @@ class Payment(models.Model):
 
     comment = models.TextField(null=True)
 
+    # denormalized from the orders by update_totals(), so listings need no per-payment queries
+    total = models.FloatField('total price', default=0)
+    summary = models.TextField('products', default='', blank=True)
+
     # billing details
     name = models.CharField(max_length=100)
     phone = models.CharField(max_length=20)
@@ -197,7 +234,8 @@ class Payment(models.Model):
         from gelv.invoice import Invoice
         invoice = Invoice(self)
         invoice_io = invoice.generate()
-        self.invoice.save(invoice.filename, ContentFile(invoice_io.getvalue()), save=True)
+        self.invoice.save(invoice.filename, ContentFile(invoice_io.getvalue()), save=False)
+        self.save(update_fields=['invoice'])
         return invoice
 
     @property
@@ -206,6 +244,19 @@ class Payment(models.Model):
         sub_total = SubscriptionOrder.objects.filter(payment=self).aggregate(models.Sum('price', default=0))['price__sum']
         return issue_total + sub_total
 
+    def update_totals(self) -> None:
+        """
+        Recompute the stored total and product summary from the orders.
+        Saved with an update, so payment signals (entitlements, emails) don't fire.
+        """
+        orders = [
+            *IssueOrder.objects.filter(payment=self).select_related('product__journal'),
+            *SubscriptionOrder.objects.filter(payment=self).select_related('product__journal'),
+        ]
+        self.total = sum(order.price for order in orders)
+        self.summary = ', '.join(dict.fromkeys(str(order.product) for order in orders))
+        Payment.objects.filter(id=self.id).update(total=self.total, summary=self.summary)
+
     @property
     def number(self) -> str:
         return f'GK{1000000 + self.id}'
@@ -291,6 +342,25 @@ class SubscriptionOrder(AbstractOrder):
         return f'{self.product} (no {IssueNumber(self.start)} līdz {IssueNumber(self.end)})'
 
 
+class Entitlement(models.Model):
+    """
+    Denormalized right of a user to an issue, derived from paid orders.
+    Kept in sync by gelv.entitlements; never edit by hand.
+    """
+    objects: Manager['Entitlement']
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    issue = models.ForeignKey(Issue, on_delete=models.CASCADE)
+
+    def __str__(self):
+        return f'{self.user} \u2014 {self.issue}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'issue'], name='unique_user_issue_entitlement'),
+        ]
+
+
 class Post(models.Model):
     """
     A news post to be shown in the feed.
@@ -319,6 +389,79 @@ class Ad(models.Model):
         return cls.objects.filter(is_active=True)
 
 
+class Job(models.Model):
+    """
+    A unit of background work (invoice generation, emails), run by `manage.py run_jobs`.
+    """
+    objects: Manager['Job']
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'pending'), (RUNNING, 'running'), (DONE, 'done'), (FAILED, 'failed')]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(default='', blank=True)
+
+    def __str__(self):
+        return f'{self.name} #{self.id} ({self.status})'
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at'),
+        ]
+
+
+class DownloadEvent(models.Model):
+    """
+    One issue download, written in batches by gelv.audit.download_log.
+    """
+    objects: Manager['DownloadEvent']
+
+    SINGLE = 'single'
+    SIGNED = 'signed'
+    BUNDLE = 'bundle'
+    KINDS = [(SINGLE, 'download'), (SIGNED, 'signed link'), (BUNDLE, 'bundle')]
+
+    user = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
+    issue = models.ForeignKey(Issue, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KINDS, default=SINGLE)
+    created = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f'{self.user} \u2014 {self.issue} ({self.created:%Y-%m-%d %H:%M})'
+
+
+class DownloadRollup(models.Model):
+    """
+    Downloads of an issue by a user on a day, kept up to date with the events, for reports.
+    Downloads without a user (or by users deleted since) may be spread over several rows; sum them.
+    """
+    objects: Manager['DownloadRollup']
+
+    day = models.DateField()
+    user = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
+    issue = models.ForeignKey(Issue, on_delete=models.CASCADE)
+    count = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.day}: {self.user} \u2014 {self.issue} \u00d7{self.count}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'user', 'issue'], name='unique_download_rollup'),
+        ]
+
+
 AnyProduct = Subscription | Issue
 AnyOrder = SubscriptionOrder | IssueOrder
 product_types: dict[str, type[Issue | Subscription]] = {'issue': Issue, 'subscription': Subscription}
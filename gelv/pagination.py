@@ -0,0 +1,161 @@
+from django.conf import settings
+from django.core import signing
+from django.core.paginator import Page, Paginator
+from django.db.models import Model, Q
+from django.db.models.query import QuerySet
+from django.http import HttpRequest
+from hashlib import md5
+from typing import Any, Iterable, Optional
+from gelv.caching import cached
+
+
+def query_hash(queryset: QuerySet) -> str:
+    return md5(str(queryset.query).encode()).hexdigest()
+
+
+def cached_count(queryset: QuerySet, models: Iterable[type[Model]]) -> int:
+    """Count a queryset, caching the result until any of the models it reads changes."""
+    return cached('count', models, queryset.count, query_hash(queryset))
+
+
+class KeysetPage:
+    """
+    A page of a KeysetPaginator, mimicking the parts of django.core.paginator.Page templates use.
+    There are no page numbers, so templates check `keyset` and link the cursors only.
+    """
+    keyset = True
+
+    def __init__(self, object_list: list, offset: int, paginator: 'KeysetPaginator',
+                 next_cursor: Optional[str], previous_cursor: Optional[str]) -> None:
+        self.object_list = object_list
+        self.offset = offset
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+    def has_previous(self) -> bool:
+        return self.previous_cursor is not None
+
+    def has_other_pages(self) -> bool:
+        return self.has_next() or self.has_previous()
+
+    def start_index(self) -> int:
+        return self.offset + 1 if self.object_list else 0
+
+    def end_index(self) -> int:
+        return self.offset + len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination over a single ordering field with the primary key as tie-breaker.
+    Pages are fetched with `WHERE (key) > (last key) LIMIT n` instead of OFFSET,
+    so deep pages cost the same as the first one. Cursors are signed, opaque tokens.
+    """
+    salt = 'gelv.pagination'
+
+    def __init__(self, queryset: QuerySet, ordering: str, per_page: int, tie_breaker: str = 'id',
+                 cache_models: Iterable[type[Model]] = ()) -> None:
+        self.queryset = queryset
+        self.per_page = per_page
+        self.descending = ordering.startswith('-')
+        self.field = ordering.lstrip('-')
+        self.tie_breaker = tie_breaker
+        self.cache_models = tuple(cache_models)
+
+    @property
+    def count(self) -> int:
+        if self.cache_models:
+            return cached_count(self.queryset, self.cache_models)
+        return self.queryset.count()
+
+    def _fetch(self, queryset: QuerySet) -> list:
+        """Evaluate a page query; with cache models set, rows are cached until those models change."""
+        if self.cache_models:
+            return cached('keyset-page', self.cache_models, lambda: list(queryset), query_hash(queryset))
+        return list(queryset)
+
+    def _fields(self) -> list[str]:
+        return [self.field] if self.field == self.tie_breaker else [self.field, self.tie_breaker]
+
+    def _order_by(self, reverse: bool) -> list[str]:
+        prefix = '-' if self.descending != reverse else ''
+        return [prefix + field for field in self._fields()]
+
+    def _key(self, obj) -> list[Any]:
+        def resolve(path: str) -> Any:
+            value = obj
+            for attr in path.split('__'):
+                value = getattr(value, attr)
+            return value
+        return [resolve(field) for field in self._fields()]
+
+    def _after(self, key: list[Any], reverse: bool) -> Q:
+        """Filter for rows strictly after a key in the (possibly reversed) ordering."""
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        fields = self._fields()
+        q = Q(**{f'{fields[-1]}__{lookup}': key[-1]})
+        for field, value in zip(reversed(fields[:-1]), reversed(key[:-1])):
+            q = Q(**{f'{field}__{lookup}': value}) | (Q(**{field: value}) & q)
+        return q
+
+    def _cursor(self, key: list[Any], backwards: bool, offset: int) -> str:
+        return signing.dumps({'o': self._order_by(False), 'k': key, 'b': backwards, 'n': offset}, salt=self.salt)
+
+    def _decode(self, cursor: Optional[str]) -> Optional[dict]:
+        if not cursor:
+            return None
+        try:
+            data = signing.loads(cursor, salt=self.salt)
+        except signing.BadSignature:
+            return None
+        return data if data.get('o') == self._order_by(False) else None
+
+    def page(self, cursor: Optional[str] = None) -> KeysetPage:
+        data = self._decode(cursor)
+        backwards = bool(data and data['b'])
+        queryset = self.queryset.order_by(*self._order_by(reverse=backwards))
+        if data:
+            queryset = queryset.filter(self._after(data['k'], reverse=backwards))
+
+        rows = self._fetch(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if data:
+            offset = max(data['n'] - len(rows), 0) if backwards else data['n']
+        else:
+            offset = 0
+
+        has_next = more if not backwards else True
+        has_previous = (more if backwards else data is not None) and offset > 0
+        next_cursor = self._cursor(self._key(rows[-1]), False, offset + len(rows)) if rows and has_next else None
+        previous_cursor = self._cursor(self._key(rows[0]), True, offset) if rows and has_previous else None
+        return KeysetPage(rows, offset, self, next_cursor, previous_cursor)
+
+
+def paginate(request: HttpRequest, queryset: QuerySet, ordering: str, per_page: int,
+             cache_models: Iterable[type[Model]] = ()) -> Page | KeysetPage:
+    """
+    Paginate a queryset with the mode in settings.PAGINATION_MODE:
+    'keyset' reads the `cursor` GET parameter, 'offset' the `page` one.
+    Keyset pages and counts are cached against `cache_models`, if given.
+    """
+    if getattr(settings, 'PAGINATION_MODE', 'keyset') == 'keyset':
+        paginator = KeysetPaginator(queryset, ordering, per_page, cache_models=cache_models)
+        return paginator.page(request.GET.get('cursor'))
+    return Paginator(queryset.order_by(ordering, 'id'), per_page).get_page(request.GET.get('page'))
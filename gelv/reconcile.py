@@ -0,0 +1,132 @@
+import csv
+import io
+import re
+import openpyxl as xl
+from django.db import transaction
+from typing import IO, Iterable, Iterator, NamedTuple, Optional
+from gelv import entitlements
+from gelv.models import Payment
+
+# a whole Payment.number: neither a longer number nor a word merely ending in GK counts
+REFERENCE_PATTERN = re.compile(r'\bGK\s*(\d{7})(?!\d)', re.IGNORECASE)
+# statement columns holding the credited amount, matched case-insensitively against the header
+AMOUNT_HEADERS = ('amount', 'credit', 'summa', 'kredīts', 'kredits')
+AMOUNT_TOLERANCE = 0.005
+
+
+class StatementLine(NamedTuple):
+    row: int
+    text: str
+    amount: Optional[float]
+    payment_ids: list[int]
+
+
+class Reconciliation(NamedTuple):
+    matched: list[tuple[StatementLine, list[int]]]
+    unmatched: list[tuple[StatementLine, str]]
+
+    @property
+    def payment_ids(self) -> list[int]:
+        return [payment_id for _, ids in self.matched for payment_id in ids]
+
+
+def parse_amount(value) -> Optional[float]:
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = re.sub(r'[^\d,.\-]', '', str(value or ''))
+    if ',' in text and '.' in text:
+        text = text.replace('.', '').replace(',', '.') if text.rfind(',') > text.rfind('.') else text.replace(',', '')
+    try:
+        return float(text.replace(',', '.'))
+    except ValueError:
+        return None
+
+
+def _rows(file: IO[bytes], filename: str) -> Iterator[tuple]:
+    if filename.lower().endswith('.xlsx'):
+        wb = xl.load_workbook(file, read_only=True, data_only=True)
+        try:
+            yield from wb.active.iter_rows(values_only=True)
+        finally:
+            wb.close()
+    else:
+        text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        yield from csv.reader(text, dialect)
+
+
+def read_statement(file: IO[bytes], filename: str) -> Iterator[StatementLine]:
+    """
+    Stream the lines of a bank statement export (CSV or XLSX).
+    The first row is the header; the amount comes from the first column named like AMOUNT_HEADERS,
+    references are looked for in all the other cells.
+    """
+    rows = _rows(file, filename)
+    header = [str(cell or '').strip().lower() for cell in next(rows, ())]
+    amount_ix = next((ix for ix, name in enumerate(header) if name.startswith(AMOUNT_HEADERS)), None)
+    for row_number, row in enumerate(rows, start=2):
+        if not any(row):
+            continue
+        cells = ['' if cell is None else str(cell) for ix, cell in enumerate(row) if ix != amount_ix]
+        text = ' '.join(filter(None, cells))
+        amount = parse_amount(row[amount_ix]) if amount_ix is not None and amount_ix < len(row) else None
+        ids = list(dict.fromkeys(int(n) - 1000000 for n in REFERENCE_PATTERN.findall(text)))
+        yield StatementLine(row_number, text, amount, ids)
+
+
+def reconcile(lines: Iterable[StatementLine]) -> Reconciliation:
+    """
+    Match statement lines against open payments by reference and amount, in one pass.
+    A line referencing several payments matches if it pays their total.
+    """
+    open_totals: dict[int, float] = dict(Payment.objects.filter(paid=False).values_list('id', 'total'))
+    matched, unmatched = [], []
+    claimed: set[int] = set()
+    for line in lines:
+        if not line.payment_ids:
+            unmatched.append((line, 'no payment reference'))
+            continue
+        unknown = [Payment(id=pk).number for pk in line.payment_ids if pk not in open_totals]
+        if unknown:
+            unmatched.append((line, f'no open payment {", ".join(unknown)}'))
+            continue
+        duplicate = [Payment(id=pk).number for pk in line.payment_ids if pk in claimed]
+        if duplicate:
+            unmatched.append((line, f'{", ".join(duplicate)} already matched by another line'))
+            continue
+        expected = sum(open_totals[pk] for pk in line.payment_ids)
+        if line.amount is None or abs(line.amount - expected) > AMOUNT_TOLERANCE:
+            unmatched.append((line, f'amount {line.amount} does not match {expected:.2f}'))
+            continue
+        claimed.update(line.payment_ids)
+        matched.append((line, line.payment_ids))
+    return Reconciliation(matched, unmatched)
+
+
+def mark_paid(payment_ids: Iterable[int]) -> list[Payment]:
+    """
+    Mark unpaid payments paid with one UPDATE (so no per-payment signals fire)
+    and sync entitlements once per user. Returns the payments that were flipped.
+    """
+    with transaction.atomic():
+        payments = list(
+            Payment.objects.filter(id__in=list(payment_ids), paid=False).select_for_update().select_related('user')
+        )
+        Payment.objects.filter(id__in=[payment.id for payment in payments]).update(paid=True)
+        entitlements.sync_users(payment.user_id for payment in payments)
+    for payment in payments:
+        payment.paid = True
+    return payments
+
+
+def write_report(unmatched: list[tuple[StatementLine, str]], out: IO[str]) -> None:
+    """Write unmatched statement lines as CSV, for following up by hand."""
+    writer = csv.writer(out)
+    writer.writerow(('row', 'amount', 'reason', 'text'))
+    for line, reason in unmatched:
+        writer.writerow((line.row, line.amount, reason, line.text))
@@ -0,0 +1,126 @@
+import re
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.db.models.query import QuerySet
+from django.utils.module_loading import import_string
+from functools import cache
+from itertools import batched
+from typing import Iterable
+from gelv.models import Issue, Journal
+from gelv.utils import IssueNumber, trace
+
+
+class SearchQuery:
+    """
+    A catalogue search string split into free text and issue numbers ('3/2024').
+    """
+    text: list[str]
+    numbers: list[int]
+
+    word_pattern = re.compile(r'\w+')
+
+    def __init__(self, query: str) -> None:
+        self.text = []
+        self.numbers = []
+        for chunk in query.split():
+            number = IssueNumber.parse(chunk)
+            if number is not None:
+                self.numbers.append(number)
+            else:
+                self.text.extend(self.word_pattern.findall(chunk))
+
+
+class SearchBackend:
+    """
+    Full-text search over journal names and issue descriptions.
+    Backends that keep an index maintain it through `index` and `remove`.
+    """
+    def match(self, queryset: QuerySet[Issue], words: list[str]) -> QuerySet[Issue]:
+        raise NotImplementedError
+
+    def index(self, issues: Iterable[Issue]) -> None:
+        pass
+
+    def remove(self, issue_ids: Iterable[int]) -> None:
+        pass
+
+    def rebuild(self) -> int:
+        """Reindex all issues, returning their number."""
+        return 0
+
+    def search(self, queryset: QuerySet[Issue], query: str) -> QuerySet[Issue]:
+        parsed = SearchQuery(query)
+        if parsed.numbers:
+            queryset = queryset.filter(number__in=parsed.numbers)
+        if parsed.text:
+            queryset = self.match(queryset, parsed.text)
+        return queryset
+
+
+class LikeSearchBackend(SearchBackend):
+    """
+    Unindexed fallback for databases without a full-text engine.
+    """
+    def match(self, queryset, words):
+        for word in words:
+            queryset = queryset.filter(Q(journal__name__icontains=word) | Q(description__icontains=word))
+        return queryset
+
+
+class SQLiteFTSSearchBackend(SearchBackend):
+    """
+    SQLite FTS5 index keyed by issue id. Words are prefix-matched and diacritics-insensitive.
+    """
+    table = 'gelv_issue_search'
+
+    def match(self, queryset, words):
+        expression = ' '.join('"{}"*'.format(word.replace('"', '""')) for word in words)
+        return queryset.filter(
+            id__in=RawSQL(f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s', (expression,))
+        )
+
+    def index(self, issues):
+        with connection.cursor() as cursor:
+            for batch in batched(issues, 2000):
+                cursor.executemany(
+                    f'INSERT OR REPLACE INTO {self.table} (rowid, journal_name, description) VALUES (%s, %s, %s)',
+                    [(issue.id, issue.journal.name, issue.description or '') for issue in batch],
+                )
+
+    def remove(self, issue_ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {self.table} WHERE rowid = %s', [(i,) for i in issue_ids])
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+        issues = Issue.objects.select_related('journal')
+        self.index(issues.iterator(chunk_size=2000))
+        return issues.count()
+
+
+@cache
+def get_backend() -> SearchBackend:
+    """Get the configured search backend, defaulting to FTS5 on SQLite."""
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if path is None:
+        path = 'gelv.search.SQLiteFTSSearchBackend' if connection.vendor == 'sqlite' else 'gelv.search.LikeSearchBackend'
+    return trace(import_string(path)(), 'search backend')
+
+
+def search(queryset: QuerySet[Issue], query: str) -> QuerySet[Issue]:
+    return get_backend().search(queryset, query)
+
+
+def index_issue(issue: Issue) -> None:
+    get_backend().index([issue])
+
+
+def index_journal(journal: Journal) -> None:
+    get_backend().index(journal.issue_set.select_related('journal'))
+
+
+def remove_issue(issue: Issue) -> None:
+    get_backend().remove([issue.id])
@@ -4,6 +4,7 @@ Django settings for gelv project.
 
 from pathlib import Path
 import os
+import tempfile
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -38,6 +39,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'gelv.tracing.RequestIdMiddleware',
+    'gelv.timing.TimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,20 +48,22 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'gelv.cart_store.CartCookieMiddleware',
 ]
 
 ROOT_URLCONF = 'gelv.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'gelv.timing.DjangoTemplates',  # the Django backend, timing renders for Server-Timing
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
-                'django.contrib.messages.context_processors.messages'
+                'django.contrib.messages.context_processors.messages',
+                'gelv.cart_store.cart_count',
             ],
         },
     },
@@ -76,6 +81,75 @@ DATABASES = {
     }
 }
 
+# Cache
+# Must be shared by all worker processes: gelv.caching invalidates by bumping version counters stored in it,
+# and a per-process cache (LocMemCache) would leave the other workers serving stale data.
+# Files in GELV_CACHE_DIR (a directory in the system temp dir by default); Memcached or Redis work as well.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('GELV_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'gelv-cache')),
+    }
+}
+
+# Background jobs, run by `manage.py run_jobs`; JOBS_EAGER runs them inline instead (no worker needed)
+JOBS_EAGER = False
+JOBS_RETRY_BASE = 30  # seconds before the first retry, doubled on every further attempt
+JOBS_RETRY_CAP = 3600
+JOBS_LOCK_TIMEOUT = 600  # seconds after which a job left running by a dead worker is retried
+
+# Messages per SMTP round when mailing in bulk (e.g. the admin's "mark as paid" action)
+MAIL_BATCH_SIZE = 50
+
+# Cart storage: a signed cookie (no database writes) or 'gelv.cart_store.SessionCartStore'
+CART_STORE = 'gelv.cart_store.CookieCartStore'
+
+# Catalogue search backend; None picks SQLite FTS5 on SQLite and an unindexed LIKE search elsewhere
+SEARCH_BACKEND = None
+
+# Catalogue and library pagination: 'keyset' (cursor links, no OFFSET) or 'offset' (numbered pages)
+PAGINATION_MODE = 'keyset'
+
+# Invoice XLSX rendering: 'template' (precompiled XML, no openpyxl per invoice) or 'openpyxl'
+INVOICE_ENGINE = 'template'
+
+# Tracing (gelv.tracing.trace): JSON records with request ids, on stderr.
+# Debug traces are only formatted at TRACE_LEVEL=DEBUG, and then only for a TRACE_SAMPLE_RATE share of requests.
+TRACE_LEVEL = os.environ.get('GELV_TRACE_LEVEL', 'DEBUG' if DEBUG else 'INFO')
+TRACE_SAMPLE_RATE = float(os.environ.get('GELV_TRACE_SAMPLE_RATE', 1.0))
+
+# Requests slower than this are logged with their slowest queries (a SLOW_REQUEST_SAMPLE_RATE share of them)
+SLOW_REQUEST_MS = 500
+SLOW_REQUEST_SAMPLE_RATE = 1.0
+# Server-Timing headers (query counts, span timings) go to staff and DEBUG servers only, unless made public here
+SERVER_TIMING_PUBLIC = False
+
+# Prometheus metrics at /metrics/ (gelv/metrics.py), for staff, scrapers sending `Authorization: Bearer <METRICS_TOKEN>`
+# and clients in METRICS_ALLOWED_IPS (addresses or networks, matched against REMOTE_ADDR).
+# Behind a reverse proxy every request comes from the proxy's address, so never list loopback (or the proxy) there.
+# Set GELV_METRICS_DIR to a directory shared by all worker processes (emptied at server start) to aggregate across them.
+METRICS_DIR = os.environ.get('GELV_METRICS_DIR')
+METRICS_FLUSH_INTERVAL = 1.0  # seconds between writes of a process's samples to METRICS_DIR
+METRICS_TOKEN = os.environ.get('GELV_METRICS_TOKEN')
+METRICS_ALLOWED_IPS = []  # type: ignore[var-annotated]
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_context': {'()': 'gelv.tracing.RequestContextFilter'},
+    },
+    'formatters': {
+        'json': {'()': 'gelv.tracing.JsonFormatter'},
+    },
+    'handlers': {
+        'trace': {'class': 'logging.StreamHandler', 'formatter': 'json', 'filters': ['request_context']},
+    },
+    'loggers': {
+        'gelv': {'handlers': ['trace'], 'level': TRACE_LEVEL, 'propagate': False},
+    },
+}
+
 # Auth urls
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/dashboard/'
@@ -120,6 +194,20 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Issue downloads: streamed by Django (development), or handed to the web server with
+# 'gelv.delivery.XAccelRedirectDelivery' (nginx) / 'gelv.delivery.XSendfileDelivery' (Apache)
+DELIVERY_BACKEND = 'gelv.delivery.DjangoDelivery'
+DELIVERY_INTERNAL_URL = '/protected/'  # nginx `internal` location aliasing MEDIA_ROOT
+
+# Signed download links on the owned page (see gelv/download_links.py); the key defaults to one derived from SECRET_KEY
+DOWNLOAD_LINK_TTL = 3600
+DOWNLOAD_LINK_KEY = None
+
+# Download audit log: events are buffered per process and written in batches of this size, or after this many seconds
+DOWNLOAD_LOG_BATCH = 100
+DOWNLOAD_LOG_INTERVAL = 30
+DOWNLOAD_LOG_MAX_BUFFER = 10000  # events kept per process while writing fails; more are dropped
+
 
 # STATICFILES_FINDERS = [
 #     'django.contrib.staticfiles.finders.FileSystemFinder',
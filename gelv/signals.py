@@ -1,29 +1,102 @@
 # signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from django.core.mail import send_mail
-from django.conf import settings
-from django.template.loader import render_to_string
-from gelv.models import Payment
-from gelv.invoice import Invoice
+from gelv.models import Payment, Journal, Issue, Subscription, IssueOrder, SubscriptionOrder
+from gelv import entitlements, search, jobs
+from gelv.caching import bump_version
 
 
 @receiver(post_save, sender=Payment)
 def send_payment_confirmation_email(sender, instance, created, update_fields, **kwargs):
     """
-    Send an email when a payment's paid field is changed from False to True.
+    Queue an email when a payment's paid field is changed from False to True.
     """
     if not created and instance.paid and (update_fields is None or 'paid' in update_fields):
-        context = {
-            'user': instance.user,
-            'payment_number': Invoice(instance).number,
-            'site_name': getattr(settings, 'SITE_NAME', None)
-        }
-
-        send_mail(
-            subject='Payment confirmed',
-            message=render_to_string('emails/paid_email.txt', context),
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            recipient_list=[instance.user.email],
-            fail_silently=False,
+        jobs.enqueue_on_commit('send_payment_confirmation', payment_id=instance.id)
+
+
+@receiver(post_save, sender=Payment)
+def sync_payment_entitlements(sender, instance, created, update_fields, **kwargs):
+    """
+    Grant or revoke entitlements when a payment's paid field may have changed.
+    """
+    if not created and (update_fields is None or 'paid' in update_fields):
+        entitlements.sync_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Payment)
+def revoke_payment_entitlements(sender, instance, **kwargs):
+    entitlements.sync_user(instance.user_id)
+
+
+@receiver(post_save, sender=IssueOrder)
+@receiver(post_delete, sender=IssueOrder)
+@receiver(post_save, sender=SubscriptionOrder)
+@receiver(post_delete, sender=SubscriptionOrder)
+def sync_order_entitlements(sender, instance, **kwargs):
+    """
+    Orders of unpaid payments grant nothing, so only paid ones are reconciled.
+    """
+    entitlements.sync_payment(instance.payment_id)
+
+
+@receiver(post_save, sender=IssueOrder)
+@receiver(post_delete, sender=IssueOrder)
+@receiver(post_save, sender=SubscriptionOrder)
+@receiver(post_delete, sender=SubscriptionOrder)
+def update_payment_totals(sender, instance, **kwargs):
+    """
+    Keep the payment's stored total and summary in line with orders edited outside checkout.
+    """
+    Payment(id=instance.payment_id).update_totals()
+
+
+@receiver(post_save, sender=Issue)
+def sync_issue_entitlements(sender, instance, **kwargs):
+    """
+    A new (or renumbered) issue may fall into existing subscription ranges.
+    """
+    entitlements.sync_issue(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def sync_subscription_entitlements(sender, instance, created, **kwargs):
+    """
+    A changed duration moves the end of every range sold for this subscription.
+    """
+    if not created:
+        entitlements.sync_users(
+            SubscriptionOrder.objects.filter(product=instance, payment__paid=True).values_list('payment__user', flat=True)
         )
+
+
+@receiver(post_save, sender=Issue)
+def index_issue(sender, instance, **kwargs):
+    search.index_issue(instance)
+
+
+@receiver(post_delete, sender=Issue)
+def unindex_issue(sender, instance, **kwargs):
+    search.remove_issue(instance)
+
+
+@receiver(post_save, sender=Journal)
+def reindex_journal(sender, instance, created, **kwargs):
+    """
+    Journal names are indexed with each issue, so a rename reindexes them all.
+    """
+    if not created:
+        search.index_journal(instance)
+
+
+@receiver(post_save, sender=Journal)
+@receiver(post_delete, sender=Journal)
+@receiver(post_save, sender=Issue)
+@receiver(post_delete, sender=Issue)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Subscription)
+def bump_catalogue_version(sender, **kwargs):
+    """
+    Move the cache keys of catalogue data derived from the changed model.
+    """
+    bump_version(sender)
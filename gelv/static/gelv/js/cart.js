@@ -0,0 +1,61 @@
+// Submit cart forms that have a JSON endpoint in the background
+// and apply the returned cart delta, instead of reloading the whole page.
+// Without JavaScript the forms keep working as plain POST + redirect.
+
+function showCartMessage(text, level) {
+    const container = document.querySelector('[data-cart-messages]');
+    if (!container || !text) {
+        return;
+    }
+    container.innerHTML = '';
+    const wrapper = document.createElement('div');
+    wrapper.className = 'messages';
+    const message = document.createElement('div');
+    message.className = level;
+    message.textContent = text;
+    wrapper.appendChild(message);
+    container.appendChild(wrapper);
+}
+
+function applyCartDelta(data) {
+    document.querySelectorAll('[data-cart-count]').forEach(counter => {
+        counter.textContent = data.cart_count;
+        counter.closest('.cart').hidden = data.cart_count === 0;
+    });
+
+    const key = `${data.item.type}-${data.item.id}`;
+    document.querySelectorAll(`form[data-cart-item="${key}"]`).forEach(form => {
+        const visible = (form.dataset.cartWhen === 'in') === data.item.in_cart;
+        form.style.display = visible ? 'flex' : 'none';
+    });
+
+    showCartMessage(data.message, data.success ? 'success' : 'info');
+}
+
+document.addEventListener('submit', async function(event) {
+    const form = event.target;
+    if (!form.dataset || !form.dataset.cartApi) {
+        return;
+    }
+    event.preventDefault();
+    // the page is not reloaded, so there is no scroll position to restore
+    sessionStorage.removeItem('scrollPosition');
+
+    try {
+        const response = await fetch(form.dataset.cartApi, {
+            method: 'POST',
+            body: new FormData(form),
+            headers: {'Accept': 'application/json'},
+            credentials: 'same-origin',
+        });
+        const data = await response.json();
+        if (response.ok) {
+            applyCartDelta(data);
+        } else {
+            showCartMessage(data.message, 'error');
+        }
+    } catch (error) {
+        // fall back to the regular form submission
+        form.submit();
+    }
+});
@@ -0,0 +1,76 @@
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.template.loader import render_to_string
+from typing import Iterable, Iterator, Optional
+from gelv import metrics
+from gelv.jobs import job
+from gelv.models import Payment
+from gelv.invoice import Invoice
+from gelv.timing import timed
+
+
+@job('send_invoice')
+def send_invoice(payment_id: int) -> None:
+    """Generate a payment's invoice, unless a previous attempt did, and mail it to the buyer."""
+    from gelv.views.checkout import send_invoice_mail
+
+    payment = Payment.objects.select_related('user').get(pk=payment_id)
+    if payment.invoice:
+        invoice = Invoice(payment)
+    else:
+        invoice = payment.generate_invoice()
+    if not send_invoice_mail(payment.user, invoice, payment.invoice.path):
+        raise RuntimeError(f'sending invoice {invoice.number} failed')
+
+
+def payment_confirmation_message(payment: Payment) -> EmailMessage:
+    context = {
+        'user': payment.user,
+        'payment_number': Invoice(payment).number,
+        'site_name': getattr(settings, 'SITE_NAME', None)
+    }
+    return EmailMessage(
+        subject='Payment confirmed',
+        body=render_to_string('emails/paid_email.txt', context),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[payment.user.email],
+    )
+
+
+@job('send_payment_confirmation')
+def send_payment_confirmation(payment_id: int) -> None:
+    payment = Payment.objects.select_related('user').get(pk=payment_id)
+    try:
+        with timed('mail'):
+            payment_confirmation_message(payment).send(fail_silently=False)
+    except Exception:
+        metrics.emails.inc(kind='paid', result='failure')
+        raise
+    metrics.emails.inc(kind='paid', result='success')
+
+
+def send_payment_confirmations(payments: Iterable[Payment],
+                               batch_size: Optional[int] = None) -> Iterator[tuple[list[Payment], Optional[Exception]]]:
+    """
+    Mail payment confirmations in batches over a single reused connection.
+    Yields each batch with the exception that failed it, if any; a failed batch doesn't stop the rest.
+    """
+    batch_size = batch_size or getattr(settings, 'MAIL_BATCH_SIZE', 50)
+    payments = list(payments)
+    connection = get_connection(fail_silently=False)
+    try:
+        for start in range(0, len(payments), batch_size):
+            batch = payments[start:start + batch_size]
+            try:
+                with timed('mail'):
+                    connection.send_messages([payment_confirmation_message(payment) for payment in batch])
+            except Exception as e:
+                # drop the (possibly broken) connection; the next batch opens a fresh one
+                connection.close()
+                metrics.emails.inc(len(batch), kind='paid', result='failure')
+                yield batch, e
+            else:
+                metrics.emails.inc(len(batch), kind='paid', result='success')
+                yield batch, None
+    finally:
+        connection.close()
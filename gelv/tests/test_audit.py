@@ -0,0 +1,70 @@
+import threading
+from unittest import mock
+from django.db import DatabaseError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from gelv.audit import DownloadLog, write
+from gelv.models import DownloadEvent, DownloadRollup, Issue, Journal, User
+
+
+class WriteTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.issue = Issue.objects.create(journal=Journal.objects.create(name='Journal'), number=1)
+        cls.user = User.objects.create_user('reader@example.com')
+
+    def events(self, user_id, count: int) -> list[DownloadEvent]:
+        return [DownloadEvent(user_id=user_id, issue=self.issue, created=timezone.now()) for _ in range(count)]
+
+    def test_rollups_add_up_over_flushes(self):
+        for _ in range(3):
+            write(self.events(self.user.id, 2) + self.events(None, 1))
+        self.assertEqual(list(DownloadRollup.objects.filter(user=self.user).values_list('count', flat=True)), [6])
+        self.assertEqual(list(DownloadRollup.objects.filter(user=None).values_list('count', flat=True)), [3])
+        self.assertEqual(DownloadEvent.objects.count(), 9)
+
+
+@override_settings(DOWNLOAD_LOG_BATCH=100, DOWNLOAD_LOG_INTERVAL=3600, DOWNLOAD_LOG_MAX_BUFFER=3)
+class DownloadLogTests(SimpleTestCase):
+    def setUp(self):
+        self.written: list[list[DownloadEvent]] = []
+        self.done = threading.Event()
+        patcher = mock.patch('gelv.audit.write', side_effect=self.write)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.log = DownloadLog()
+        self.addCleanup(self.log.events.clear)
+
+    def write(self, events: list[DownloadEvent]) -> None:
+        self.written.append(events)
+        self.done.set()
+
+    def test_overflow_is_dropped(self):
+        for issue_id in range(5):
+            self.log.record(None, issue_id)
+        self.assertEqual([event.issue_id for event in self.log.events], [0, 1, 2])
+        with self.assertLogs('gelv', 'WARNING'):
+            self.assertEqual(self.log.flush(), 3)
+
+    def test_failed_flush_keeps_the_oldest_events_within_the_cap(self):
+        self.log.record(None, 0)
+        self.log.record(None, 1)
+        with mock.patch('gelv.audit.write', side_effect=DatabaseError), self.assertLogs('gelv', 'ERROR'):
+            self.assertEqual(self.log.flush(), 0)
+        self.log.record(None, 2)
+        self.log.record(None, 3)
+        self.assertEqual([event.issue_id for event in self.log.events], [0, 1, 2])
+        self.assertEqual(self.log.dropped, 1)
+
+    @override_settings(DOWNLOAD_LOG_BATCH=2)
+    def test_full_batch_is_written_in_the_background(self):
+        self.log.record(None, 0)
+        self.log.record(None, 1)
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual([[event.issue_id for event in events] for events in self.written], [[0, 1]])
+
+    @override_settings(DOWNLOAD_LOG_INTERVAL=0.05)
+    def test_quiet_process_flushes_on_the_timer(self):
+        self.log.record(None, 0)
+        self.assertTrue(self.done.wait(5))
+        self.assertEqual(self.log.events, [])
@@ -0,0 +1,30 @@
+import json
+from django.test import TestCase
+from django.urls import reverse
+from gelv.models import Journal, Subscription
+
+
+class ChangeSubscriptionStartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.subscription = Subscription.objects.create(journal=Journal.objects.create(name='Journal'), duration=12)
+
+    def post(self, name: str, **data) -> dict:
+        item = {'type': 'subscription', 'id': self.subscription.id, 'metadata': {'start': 1}}
+        response = self.client.post(reverse(name), json.dumps(item | data), content_type='application/json')
+        return {'status': response.status_code, **response.json()}
+
+    def test_change_start(self):
+        self.post('add_to_cart_json')
+        result = self.post('change_subscription_start_json', new_start='5')
+        self.assertEqual((result['status'], result['item']['metadata']), (200, {'start': 5}))
+
+    def test_invalid_start(self):
+        self.post('add_to_cart_json')
+        for new_start in ('five', '', [5]):
+            result = self.post('change_subscription_start_json', new_start=new_start)
+            self.assertEqual((result['status'], result['success']), (400, False), new_start)
+
+    def test_invalid_json(self):
+        response = self.client.post(reverse('add_to_cart_json'), '{', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,69 @@
+from django.contrib.sessions.backends.signed_cookies import SessionStore
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase
+from gelv.cart_store import CookieCartStore
+
+RAW = [
+    {'type': 'issue', 'id': 12, 'metadata': {}},
+    {'type': 'subscription', 'id': 3, 'metadata': {'start': 184}},
+]
+
+
+class CookieCartStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.store = CookieCartStore()
+
+    def request(self, cookie=None, signed=True):
+        request = RequestFactory().get('/')
+        request.session = SessionStore()
+        if cookie is not None:
+            if signed:
+                response = HttpResponse()
+                response.set_signed_cookie(self.store.cookie_name, cookie, salt=self.store.salt)
+                cookie = response.cookies[self.store.cookie_name].value
+            request.COOKIES[self.store.cookie_name] = cookie
+        return request
+
+    def test_encode_decode(self):
+        self.assertEqual(self.store.encode(RAW), 'i12.s3-184')
+        self.assertEqual(self.store.decode('i12.s3-184'), RAW)
+        self.assertEqual(self.store.decode(''), [])
+
+    def test_malformed_cookies_are_discarded(self):
+        for value in ('x12', 'i', 'ix', 's3-x', '-', 'i12.s3-1.5', '.s'):
+            with self.subTest(value=value), self.assertLogs('gelv', 'INFO'):
+                self.assertEqual(self.store.load(self.request(value)), [])
+
+    def test_unsigned_or_tampered_cookie_falls_back_to_the_session(self):
+        request = self.request('i12', signed=False)
+        request.session['cart'] = RAW
+        self.assertEqual(self.store.load(request), RAW)
+
+        request = self.request('i12')
+        request.COOKIES[self.store.cookie_name] = request.COOKIES[self.store.cookie_name].replace('i12', 'i13')
+        self.assertEqual(self.store.load(request), [])
+
+    def test_save_and_apply(self):
+        request = self.request()
+        request.session['cart'] = [{'type': 'issue', 'id': 1, 'metadata': {}}]
+        self.store.save(request, RAW)
+        self.assertNotIn('cart', request.session)
+        response = HttpResponse()
+        self.store.apply(request, response)
+        cookie = response.cookies[self.store.cookie_name]
+        self.assertTrue(cookie['httponly'])
+        self.assertEqual(self.store.load(self.request(cookie.value, signed=False)), RAW)
+
+    def test_oversized_cart_lives_in_the_session(self):
+        raw = [{'type': 'issue', 'id': n, 'metadata': {}} for n in range(1000, 2000)]
+        request = self.request()
+        self.store.save(request, raw)
+        self.assertEqual(request.session['cart'], raw)
+        response = HttpResponse()
+        self.store.apply(request, response)
+        self.assertEqual(response.cookies[self.store.cookie_name]['max-age'], 0)
+
+    def test_unchanged_cart_sets_no_cookie(self):
+        response = HttpResponse()
+        self.store.apply(self.request(), response)
+        self.assertNotIn(self.store.cookie_name, response.cookies)
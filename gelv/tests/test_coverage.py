@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase, TestCase
+from gelv.coverage import compute_coverage, coverage_q, covers, merge_intervals
+from gelv.models import Issue, Journal, Payment, Subscription, SubscriptionOrder, User
+
+
+class MergeIntervalsTests(SimpleTestCase):
+    def test_merge(self):
+        self.assertEqual(merge_intervals([]), [])
+        self.assertEqual(merge_intervals([(5, 10)]), [(5, 10)])
+        # overlapping, adjacent, contained and unsorted renewals collapse; gaps stay
+        self.assertEqual(
+            merge_intervals([(25, 37), (1, 13), (13, 25), (3, 5), (40, 52), (45, 50)]),
+            [(1, 37), (40, 52)],
+        )
+
+
+class CoversTests(SimpleTestCase):
+    coverage = {1: [(1, 13), (25, 37)], 2: [(100, 101)]}
+
+    def test_covers(self):
+        self.assertEqual([n for n in range(0, 40) if covers(self.coverage, 1, n)], [*range(1, 13), *range(25, 37)])
+        self.assertTrue(covers(self.coverage, 2, 100))
+        self.assertFalse(covers(self.coverage, 2, 101))
+        self.assertFalse(covers(self.coverage, 3, 1))
+        self.assertFalse(covers({}, 1, 1))
+
+
+class ComputeCoverageTests(TestCase):
+    def test_paid_orders_merged_per_journal(self):
+        user = User.objects.create_user('reader@example.com')
+        journal, other = Journal.objects.create(name='A'), Journal.objects.create(name='B')
+        yearly = Subscription.objects.create(journal=journal, duration=12)
+        half = Subscription.objects.create(journal=other, duration=6)
+        paid = Payment.objects.create(user=user, paid=True)
+        unpaid = Payment.objects.create(user=user)
+        for payment, product, start in ((paid, yearly, 1), (paid, yearly, 13), (paid, half, 7), (unpaid, yearly, 40)):
+            SubscriptionOrder.objects.create(payment=payment, product=product, start=start, price=1)
+        coverage = compute_coverage(user.id)
+        self.assertEqual(coverage, {journal.id: [(1, 25)], other.id: [(7, 13)]})
+        issues = [Issue.objects.create(journal=journal, number=n) for n in (1, 24, 25, 40)]
+        self.assertEqual(set(Issue.objects.filter(coverage_q(coverage))), set(issues[:2]))
+        self.assertFalse(Issue.objects.filter(coverage_q({})).exists())
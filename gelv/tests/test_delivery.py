@@ -0,0 +1,90 @@
+import shutil
+import tempfile
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from gelv.delivery import DjangoDelivery, parse_range
+from gelv.models import Issue
+from gelv.views.download import _serve
+
+CONTENT = bytes(range(256)) * 4  # 1024 bytes
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_single_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), [(0, 99)])
+        self.assertEqual(parse_range('bytes=900-', 1000), [(900, 999)])
+        self.assertEqual(parse_range('bytes=-100', 1000), [(900, 999)])
+        self.assertEqual(parse_range('bytes=990-2000', 1000), [(990, 999)])
+        self.assertEqual(parse_range('bytes=-2000', 1000), [(0, 999)])
+
+    def test_multiple_ranges_are_sorted_and_merged(self):
+        self.assertEqual(parse_range('bytes=500-599, 0-99,100-199', 1000), [(0, 199), (500, 599)])
+        self.assertEqual(parse_range('bytes=0-10,5-20,50-60', 1000), [(0, 20), (50, 60)])
+
+    def test_unsatisfiable(self):
+        self.assertEqual(parse_range('bytes=1000-', 1000), [])
+        self.assertEqual(parse_range('bytes=2000-3000', 1000), [])
+
+    def test_ignored(self):
+        for header in ('items=0-1', 'bytes=', 'bytes=-', 'bytes=a-b', 'bytes=5-1', 'bytes=1-2;3-4',
+                       'bytes=' + ','.join(f'{n * 10}-{n * 10 + 1}' for n in range(17))):
+            self.assertIsNone(parse_range(header, 1000), header)
+
+
+class ServeTests(SimpleTestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        name = default_storage.save('issues/issue.pdf', ContentFile(CONTENT))
+        self.issue = Issue(id=1, file=name, file_hash='abc', file_size=len(CONTENT))
+        self.factory = RequestFactory()
+
+    def serve(self, method: str = 'get', **headers):
+        return _serve(getattr(self.factory, method)('/download/1/', headers=headers), self.issue)
+
+    @staticmethod
+    def body(response) -> bytes:
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def test_whole_file(self):
+        response = self.serve()
+        self.assertEqual((response.status_code, response['ETag']), (200, '"abc"'))
+        self.assertEqual(self.body(response), CONTENT)
+
+    def test_single_range(self):
+        response = self.serve(Range='bytes=10-19')
+        self.assertEqual((response.status_code, response['Content-Range']), (206, 'bytes 10-19/1024'))
+        self.assertEqual(self.body(response), CONTENT[10:20])
+
+    def test_multiple_ranges(self):
+        response = self.serve(Range='bytes=0-9,100-109')
+        body = self.body(response)
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response['Content-Type'].startswith('multipart/byteranges; boundary='))
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertIn(b'Content-Range: bytes 100-109/1024\r\n\r\n' + CONTENT[100:110], body)
+
+    def test_unsatisfiable_range(self):
+        response = self.serve(Range='bytes=5000-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */1024'))
+
+    def test_if_range(self):
+        self.assertEqual(self.serve(Range='bytes=0-9', **{'If-Range': '"abc"'}).status_code, 206)
+        self.assertEqual(self.serve(Range='bytes=0-9', **{'If-Range': '"old"'}).status_code, 200)
+        self.assertEqual(self.serve(Range='bytes=0-9', **{'If-Range': 'Wed, 21 Oct 2015 07:28:00 GMT'}).status_code, 200)
+
+    def test_conditional_get(self):
+        self.assertEqual(self.serve(**{'If-None-Match': '"abc"'}).status_code, 304)
+        self.assertEqual(self.serve(**{'If-None-Match': '"old"'}).status_code, 200)
+
+    def test_head(self):
+        response = self.serve('head')
+        self.assertEqual((response.status_code, response['Content-Length']), (200, '1024'))
+
+    def test_if_range_without_etag_sends_the_whole_file(self):
+        request = self.factory.get('/', headers={'Range': 'bytes=0-9', 'If-Range': '"abc"'})
+        self.assertEqual(DjangoDelivery().serve(request, self.issue.file, size=len(CONTENT)).status_code, 200)
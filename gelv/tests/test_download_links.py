@@ -0,0 +1,40 @@
+from django.test import SimpleTestCase, TestCase
+from gelv.download_links import make_token, verify
+
+KEY = b'k' * 32
+EXPIRES = 2_000_000_000
+
+
+class VerifyTests(SimpleTestCase):
+    def test_valid(self):
+        self.assertEqual(verify(KEY, 5, make_token(KEY, 7, 5, EXPIRES), now=EXPIRES - 1), 7)
+
+    def test_tampered(self):
+        token = make_token(KEY, 7, 5, EXPIRES)
+        self.assertIsNone(verify(KEY, 6, token, now=0))
+        self.assertIsNone(verify(b'x' * 32, 5, token, now=0))
+        self.assertIsNone(verify(KEY, 5, token.replace('7-', '8-', 1), now=0))
+        self.assertIsNone(verify(KEY, 5, f'7-{EXPIRES + 60}-{token.rsplit("-", 1)[1]}', now=0))
+        self.assertIsNone(verify(KEY, 5, token[:-1] + ('A' if token[-1] != 'A' else 'B'), now=0))
+
+    def test_non_canonical_numbers(self):
+        token = make_token(KEY, 7, 5, EXPIRES)
+        self.assertIsNone(verify(KEY, 5, '+' + token, now=0))
+        self.assertIsNone(verify(KEY, 5, '0' + token, now=0))
+
+    def test_expired(self):
+        self.assertIsNone(verify(KEY, 5, make_token(KEY, 7, 5, EXPIRES), now=EXPIRES + 1))
+
+    def test_malformed(self):
+        for token in ('', '7', '7-x-abc', 'a-b-c', '7-1e9-abc'):
+            self.assertIsNone(verify(KEY, 5, token, now=0), token)
+
+    def test_non_ascii(self):
+        self.assertIsNone(verify(KEY, 5, '7-99999999999-é', now=0))
+        self.assertIsNone(verify(KEY, 5, '٧-99999999999-abc', now=0))
+
+
+class SignedDownloadViewTests(TestCase):
+    def test_invalid_link_falls_back_to_the_checked_download(self):
+        response = self.client.get('/download/1/1-99999999999-%C3%A9/')
+        self.assertRedirects(response, '/download/1/', fetch_redirect_response=False)
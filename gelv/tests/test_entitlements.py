@@ -0,0 +1,45 @@
+from django.test import TestCase
+from gelv.entitlements import owns_issue
+from gelv.models import Entitlement, Issue, IssueOrder, Journal, Payment, Subscription, SubscriptionOrder, User
+
+
+class OwnsIssueTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.journal = Journal.objects.create(name='Journal')
+        cls.issues = [Issue.objects.create(journal=cls.journal, number=number) for number in range(1, 6)]
+        cls.subscription = Subscription.objects.create(journal=cls.journal, duration=2)
+        cls.user = User.objects.create_user('reader@example.com')
+
+    def pay(self, payment: Payment) -> None:
+        payment.paid = True
+        payment.save()
+
+    def test_bought_issue(self):
+        payment = Payment.objects.create(user=self.user)
+        IssueOrder.objects.create(payment=payment, product=self.issues[0], price=1)
+        self.assertFalse(owns_issue(self.user, self.issues[0].id))
+        self.pay(payment)
+        self.assertTrue(owns_issue(self.user, self.issues[0].id))
+        self.assertFalse(owns_issue(self.user, self.issues[1].id))
+
+    def test_subscription_range(self):
+        payment = Payment.objects.create(user=self.user)
+        SubscriptionOrder.objects.create(payment=payment, product=self.subscription, start=2, price=1)
+        self.pay(payment)
+        self.assertEqual([owns_issue(self.user, issue.id) for issue in self.issues], [False, True, True, False, False])
+
+    def test_new_issue_in_range(self):
+        payment = Payment.objects.create(user=self.user)
+        SubscriptionOrder.objects.create(payment=payment, product=self.subscription, start=6, price=1)
+        self.pay(payment)
+        issue = Issue.objects.create(journal=self.journal, number=6)
+        self.assertTrue(owns_issue(self.user, issue.id))
+
+    def test_refund_revokes(self):
+        payment = Payment.objects.create(user=self.user)
+        IssueOrder.objects.create(payment=payment, product=self.issues[0], price=1)
+        self.pay(payment)
+        payment.delete()
+        self.assertFalse(owns_issue(self.user, self.issues[0].id))
+        self.assertFalse(Entitlement.objects.filter(user=self.user).exists())
@@ -0,0 +1,66 @@
+import openpyxl as xl
+from django.test import SimpleTestCase, TestCase
+from gelv.invoice import Invoice, get_invoice_template
+from gelv.models import Issue, IssueOrder, Journal, Payment, Subscription, SubscriptionOrder, User
+
+FIELDS = {
+    'number': 'GE-1', 'date': '01.03.2024', 'name': 'Bērziņš & <Co> "SIA"', 'personal_code': '010101-12345',
+    'address': 'Rīga', 'billing_email': 'a&b@example.com', 'phone': '+371 2000', 'email': 'a&b@example.com',
+    'total': '12.50', 'total_words': 'divpadsmit eiro 50 centi',
+}
+
+
+def product(n: int) -> tuple[str, str, str, float]:
+    return f'Žurnāls <{n}> & co', '1', '2.50', 2.5
+
+
+class InvoiceTemplateTests(SimpleTestCase):
+    def render(self, count: int):
+        return xl.load_workbook(get_invoice_template().render(FIELDS, [product(n) for n in range(count)])).active
+
+    def test_fields(self):
+        ws = self.render(1)
+        for name, cell in get_invoice_template().fields.items():
+            with self.subTest(name=name):
+                # the tail cells move with the product rows; one product is one row up from the two sample rows
+                if int(cell[1:]) > 22:
+                    cell = f'{cell[0]}{int(cell[1:]) - 1}'
+                self.assertEqual(ws[cell].value, FIELDS[name])
+        self.assertEqual(ws['B18'].hyperlink.target, 'mailto:a&b@example.com')
+
+    def test_product_rows_shift_the_tail(self):
+        for count in (0, 1, 2, 5):
+            with self.subTest(count=count):
+                ws = self.render(count)
+                shift = count - 2
+                self.assertEqual([ws.cell(22 + n, 1).value for n in range(count)], [product(n)[0] for n in range(count)])
+                self.assertEqual([ws.cell(22 + n, 5).value for n in range(count)], [2.5] * count)
+                self.assertEqual(ws['A21'].value, 'Nosaukums')
+                self.assertEqual((ws[f'A{25 + shift}'].value, ws[f'E{25 + shift}'].value), ('Pavisam apmaksai', '12.50'))
+                self.assertEqual(ws[f'B{27 + shift}'].value, FIELDS['total_words'])
+
+
+class InvoiceEngineTests(TestCase):
+    def test_template_matches_openpyxl(self):
+        user = User.objects.create_user('reader@example.com')
+        journal = Journal.objects.create(name='Žurnāls & co')
+        payment = Payment.objects.create(
+            user=user, name='Bērziņš <SIA>', personal_code='010101-12345', address='Rīga & co',
+            phone='+371 2000', billing_email='a@example.com',
+        )
+        IssueOrder.objects.create(payment=payment, product=Issue.objects.create(journal=journal, number=1), price=2.5)
+        IssueOrder.objects.create(payment=payment, product=Issue.objects.create(journal=journal, number=2), price=3)
+        subscription = Subscription.objects.create(journal=journal, duration=12)
+        SubscriptionOrder.objects.create(payment=payment, product=subscription, start=3, price=20)
+
+        invoice = Invoice(payment)
+        template = xl.load_workbook(invoice.generate_from_template(get_invoice_template())).active
+        reference = xl.load_workbook(invoice.generate_openpyxl()).active
+        self.assertEqual(template.max_row, reference.max_row)
+        for template_row, reference_row in zip(template.iter_rows(), reference.iter_rows()):
+            for cell, expected in zip(template_row, reference_row):
+                # openpyxl writes every product cell as a string; the template keeps line totals numeric
+                if cell.column == 5 and isinstance(cell.value, (int, float)):
+                    self.assertEqual(cell.value, float(expected.value), cell.coordinate)
+                else:
+                    self.assertEqual(cell.value, expected.value, cell.coordinate)
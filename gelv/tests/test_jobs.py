@@ -0,0 +1,80 @@
+from datetime import timedelta
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from gelv import jobs
+from gelv.models import Job
+
+
+class BackoffTests(SimpleTestCase):
+    @override_settings(JOBS_RETRY_BASE=30, JOBS_RETRY_CAP=3600)
+    def test_exponential_and_capped(self):
+        self.assertEqual([jobs.backoff(n).total_seconds() for n in range(1, 10)],
+                         [30, 60, 120, 240, 480, 960, 1920, 3600, 3600])
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        jobs.job('test.record')(lambda **payload: self.calls.append(payload))
+        jobs.job('test.fail')(lambda **payload: 1 / 0)
+        self.addCleanup(jobs._handlers.pop, 'test.record')
+        self.addCleanup(jobs._handlers.pop, 'test.fail')
+
+    def test_enqueue(self):
+        with self.assertRaises(KeyError):
+            jobs.enqueue('test.unknown')
+        job = jobs.enqueue('test.record', n=1)
+        self.assertEqual((job.status, job.payload), (Job.PENDING, {'n': 1}))
+        with override_settings(JOBS_EAGER=True):
+            self.assertIsNone(jobs.enqueue('test.record', n=2))
+        self.assertEqual(self.calls, [{'n': 2}])
+
+    def test_claim_takes_due_jobs_once_in_order(self):
+        now = timezone.now()
+        later = jobs.enqueue('test.record', n=2)
+        first = jobs.enqueue('test.record', n=1)
+        future = jobs.enqueue('test.record', n=3)
+        Job.objects.filter(id=first.id).update(run_at=now - timedelta(minutes=2))
+        Job.objects.filter(id=later.id).update(run_at=now - timedelta(minutes=1))
+        Job.objects.filter(id=future.id).update(run_at=now + timedelta(minutes=1))
+
+        self.assertEqual(jobs.claim().id, first.id)
+        claimed = jobs.claim()
+        self.assertEqual((claimed.id, claimed.status), (later.id, Job.RUNNING))
+        self.assertIsNone(jobs.claim())
+
+    @override_settings(JOBS_LOCK_TIMEOUT=600)
+    def test_stale_running_jobs_are_taken_again(self):
+        job = jobs.enqueue('test.record')
+        jobs.claim()
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(seconds=599))
+        self.assertIsNone(jobs.claim())
+        Job.objects.filter(id=job.id).update(locked_at=timezone.now() - timedelta(seconds=601))
+        self.assertEqual(jobs.claim().id, job.id)
+
+    @override_settings(JOBS_RETRY_BASE=30, JOBS_RETRY_CAP=3600)
+    def test_failures_retry_with_backoff_then_give_up(self):
+        job = jobs.enqueue('test.fail')
+        Job.objects.filter(id=job.id).update(max_attempts=2)
+        with self.assertLogs('gelv', 'WARNING'):
+            self.assertEqual(jobs.run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_at), (Job.PENDING, 1, None))
+        self.assertIn('ZeroDivisionError', job.last_error)
+        self.assertAlmostEqual((job.run_at - timezone.now()).total_seconds(), 30, delta=5)
+        self.assertIsNone(jobs.claim())  # not due yet
+
+        Job.objects.filter(id=job.id).update(run_at=timezone.now())
+        with self.assertLogs('gelv', 'WARNING'):
+            self.assertEqual(jobs.run_pending(), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIsNotNone(job.finished)
+
+    def test_run_pending(self):
+        for n in range(3):
+            jobs.enqueue('test.record', n=n)
+        self.assertEqual(jobs.run_pending(limit=2), (2, 0))
+        self.assertEqual(jobs.run_pending(), (1, 0))
+        self.assertEqual(sorted(call['n'] for call in self.calls), [0, 1, 2])
+        self.assertEqual(set(Job.objects.values_list('status', flat=True)), {Job.DONE})
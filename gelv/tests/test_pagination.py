@@ -0,0 +1,83 @@
+from django.test import TestCase, override_settings
+from gelv.models import Ad, Issue, Journal
+from gelv.pagination import KeysetPaginator
+
+LOCMEM_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PaginationTemplateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ad.objects.create(name='Ad', image='ads/ad.png')  # base.html shows one
+        journal = Journal.objects.create(name='Journal')
+        Issue.objects.bulk_create(Issue(journal=journal, number=number) for number in range(1, 26))
+
+    @override_settings(PAGINATION_MODE='keyset')
+    def test_keyset_controls(self):
+        response = self.client.get('/catalogue/', {'sort': 'newest'})
+        self.assertContains(response, '<span class="current">1&ndash;20</span>', html=True)
+        self.assertContains(response, 'cursor=')
+        self.assertNotContains(response, 'page=')
+
+        response = self.client.get('/catalogue/', {'sort': 'newest', 'cursor': response.context['products'].next_cursor})
+        self.assertContains(response, '<span class="current">21&ndash;25</span>', html=True)
+        self.assertContains(response, 'Previous')
+        self.assertNotContains(response, 'Next')
+
+    @override_settings(PAGINATION_MODE='offset')
+    def test_offset_controls(self):
+        response = self.client.get('/catalogue/')
+        self.assertContains(response, '<span class="current">1</span>', html=True)
+        self.assertContains(response, 'page=2')
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        journals = [Journal.objects.create(name=name) for name in ('B', 'A', 'C')]
+        # few distinct prices and names, so the tie-breaker decides most of the order
+        Issue.objects.bulk_create(
+            Issue(journal=journals[n % 3], number=n, price=n % 4) for n in range(1, 24)
+        )
+
+    def walk(self, ordering: str) -> tuple[list[int], list[int]]:
+        """Ids page by page to the end, then back again from the last page."""
+        paginator = KeysetPaginator(Issue.objects.all(), ordering, per_page=5)
+        pages = [paginator.page()]
+        while pages[-1].has_next():
+            pages.append(paginator.page(pages[-1].next_cursor))
+        forward = [issue.id for page in pages for issue in page]
+        backward_pages = [pages[-1]]
+        while backward_pages[-1].has_previous():
+            backward_pages.append(paginator.page(backward_pages[-1].previous_cursor))
+        backward = [issue.id for page in reversed(backward_pages) for issue in page]
+        for page in pages:
+            self.assertEqual(page.end_index() - page.start_index() + 1, len(page))
+        return forward, backward
+
+    def test_orderings(self):
+        for ordering in ('price', '-price', 'journal__name', '-id', 'number'):
+            with self.subTest(ordering=ordering):
+                # the tie-breaker follows the direction of the ordering
+                tie_breaker = '-id' if ordering.startswith('-') else 'id'
+                expected = list(Issue.objects.order_by(ordering, tie_breaker).values_list('id', flat=True))
+                forward, backward = self.walk(ordering)
+                self.assertEqual(forward, expected)
+                self.assertEqual(backward, expected)
+
+    def test_positions(self):
+        paginator = KeysetPaginator(Issue.objects.all(), 'number', per_page=10)
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        self.assertEqual((second.start_index(), second.end_index(), second.has_previous()), (11, 20, True))
+        self.assertEqual(paginator.page(second.previous_cursor).start_index(), 1)
+        self.assertFalse(paginator.page(second.previous_cursor).has_previous())
+        self.assertEqual(paginator.count, 23)
+
+    def test_foreign_or_tampered_cursors_start_over(self):
+        cursor = KeysetPaginator(Issue.objects.all(), 'price', per_page=5).page().next_cursor
+        paginator = KeysetPaginator(Issue.objects.all(), 'number', per_page=5)
+        self.assertEqual([issue.number for issue in paginator.page(cursor)], [1, 2, 3, 4, 5])
+        self.assertEqual([issue.number for issue in paginator.page(cursor[:-2] + 'xx')], [1, 2, 3, 4, 5])
+        self.assertFalse(paginator.page('garbage').has_previous())
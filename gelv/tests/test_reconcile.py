@@ -0,0 +1,27 @@
+import io
+from django.test import SimpleTestCase
+from gelv.reconcile import parse_amount, read_statement
+
+
+class ReadStatementTests(SimpleTestCase):
+    def payment_ids(self, text: str) -> list[int]:
+        statement = f'Amount;Details\n10.00;{text}\n'.encode()
+        return [line.payment_ids for line in read_statement(io.BytesIO(statement), 'statement.csv')][0]
+
+    def test_references(self):
+        self.assertEqual(self.payment_ids('Invoice GK1000123'), [123])
+        self.assertEqual(self.payment_ids('gk 1000123, GK1000124'), [123, 124])
+
+    def test_longer_numbers_are_not_references(self):
+        self.assertEqual(self.payment_ids('GK10000123'), [])
+        self.assertEqual(self.payment_ids('XGK1000123'), [])
+
+
+class ParseAmountTests(SimpleTestCase):
+    def test_formats(self):
+        self.assertEqual(parse_amount(12), 12.0)
+        self.assertEqual(parse_amount('12,50'), 12.5)
+        self.assertEqual(parse_amount('1.234,50 EUR'), 1234.5)
+        self.assertEqual(parse_amount('1,234.50'), 1234.5)
+        self.assertIsNone(parse_amount(''))
+        self.assertIsNone(parse_amount(None))
@@ -0,0 +1,24 @@
+from django.test import TestCase, override_settings
+from gelv.models import Ad, User
+
+
+class TimingMiddlewareTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Ad.objects.create(name='Ad', image='ads/ad.png')  # base.html shows one
+
+    def test_no_server_timing_for_visitors(self):
+        self.assertNotIn('Server-Timing', self.client.get('/catalogue/'))
+
+    def test_server_timing_for_staff(self):
+        self.client.force_login(User.objects.create_user('staff@example.com', is_staff=True))
+        self.assertIn('db;dur=', self.client.get('/catalogue/')['Server-Timing'])
+
+    @override_settings(SERVER_TIMING_PUBLIC=True)
+    def test_public_server_timing(self):
+        self.assertIn('template;dur=', self.client.get('/catalogue/')['Server-Timing'])
+
+    def test_timed_templates_keep_test_instrumentation(self):
+        response = self.client.get('/catalogue/')
+        self.assertTemplateUsed(response, 'catalogue/catalogue.html')
+        self.assertIn('request', response.context)
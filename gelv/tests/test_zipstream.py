@@ -0,0 +1,54 @@
+import io
+import zipfile
+import zlib
+from datetime import datetime
+from django.test import SimpleTestCase
+from gelv.zipstream import ZIP32_LIMIT, ZipEntry, ZipStream
+
+MODIFIED = datetime(2024, 3, 1, 12, 30, 10)
+
+
+def entry(name: str, data: bytes) -> ZipEntry:
+    return ZipEntry(name, len(data), zlib.crc32(data), MODIFIED, lambda: io.BytesIO(data))
+
+
+class Zeros(io.RawIOBase):
+    """A file of `size` zero bytes, without holding them."""
+    def __init__(self, size: int) -> None:
+        self.remaining = size
+
+    def read(self, n: int = -1) -> bytes:
+        n = self.remaining if n < 0 else min(n, self.remaining)
+        self.remaining -= n
+        return bytes(n)
+
+
+class ZipStreamTests(SimpleTestCase):
+    def test_archive_is_readable_and_as_long_as_announced(self):
+        files = {'Žurnāls 1-2024.pdf': b'%PDF' + bytes(range(256)) * 300, 'empty.pdf': b'', 'b.pdf': b'x'}
+        archive = ZipStream([entry(name, data) for name, data in files.items()])
+        body = b''.join(archive)
+        self.assertEqual(len(archive), len(body))
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual({info.filename: zf.read(info) for info in zf.infolist()}, files)
+            self.assertEqual(zf.getinfo('b.pdf').date_time, (2024, 3, 1, 12, 30, 10))
+            self.assertEqual({info.compress_type for info in zf.infolist()}, {zipfile.ZIP_STORED})
+
+    def test_empty_archive(self):
+        archive = ZipStream([])
+        body = b''.join(archive)
+        self.assertEqual(len(archive), len(body))
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            self.assertEqual(zf.namelist(), [])
+
+    def test_zip64_length(self):
+        # an entry past the ZIP32 size limit and one past the offset limit; the CRC isn't checked here
+        big = ZipEntry('big.pdf', ZIP32_LIMIT + 1, 0, MODIFIED, lambda: Zeros(ZIP32_LIMIT + 1))
+        archive = ZipStream([big, entry('after.pdf', b'after')])
+        self.assertEqual(len(archive), sum(len(chunk) for chunk in archive))
+
+    def test_short_file_fails(self):
+        archive = ZipStream([ZipEntry('short.pdf', 10, 0, MODIFIED, lambda: io.BytesIO(b'12345'))])
+        with self.assertRaises(IOError):
+            b''.join(archive)
@@ -0,0 +1,157 @@
+import contextvars
+import functools
+import logging
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.template.backends.django import DjangoTemplates as BaseDjangoTemplates
+from typing import Callable, Iterator, Optional
+from gelv import metrics
+from gelv.tracing import trace
+
+
+class RequestTimings:
+    """Where one request's time went: named spans, SQL queries and cache lookups."""
+    def __init__(self) -> None:
+        self.spans: dict[str, list[float]] = {}  # name -> [seconds, count]
+        self.queries: list[tuple[str, float]] = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def add(self, name: str, seconds: float) -> None:
+        span = self.spans.setdefault(name, [0.0, 0])
+        span[0] += seconds
+        span[1] += 1
+
+    def server_timing(self, total: float) -> str:
+        entries = [f'total;dur={total * 1000:.1f}']
+        if self.queries:
+            db = sum(seconds for _, seconds in self.queries)
+            entries.append(f'db;dur={db * 1000:.1f};desc="{len(self.queries)} queries"')
+        for name, (seconds, count) in self.spans.items():
+            entries.append(f'{name};dur={seconds * 1000:.1f}' + (f';desc="{count}x"' if count > 1 else ''))
+        if self.cache_hits or self.cache_misses:
+            entries.append(f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses"')
+        return ', '.join(entries)
+
+
+current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar('gelv_timings', default=None)
+
+
+@contextmanager
+def timed(name: str) -> Iterator[None]:
+    """Add the time spent in the block to the current request's `name` span (no-op outside requests)."""
+    timings = current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def timed_function(name: str) -> Callable:
+    """Decorator form of timed()."""
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count_cache(name: str, hit: bool) -> None:
+    metrics.cache_lookups.inc(cache=name, result='hit' if hit else 'miss')
+    timings = current.get()
+    if timings is not None:
+        if hit:
+            timings.cache_hits += 1
+        else:
+            timings.cache_misses += 1
+
+
+class TimingMiddleware:
+    """
+    Time each request: SQL queries, template rendering, cache lookups and named spans (invoices, mail)
+    go into a Server-Timing header (for staff, with DEBUG or settings.SERVER_TIMING_PUBLIC),
+    the total into the per-URL-name latency histogram (gelv.metrics).
+    Requests slower than settings.SLOW_REQUEST_MS are logged with their queries,
+    a settings.SLOW_REQUEST_SAMPLE_RATE share of them.
+    """
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        timings = RequestTimings()
+        token = current.set(timings)
+
+        def record_query(execute, sql, params, many, context):
+            started = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                timings.queries.append((sql, time.perf_counter() - started))
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(record_query))
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        total = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        url_name = (match.url_name or match.view_name) if match else 'unmatched'
+        metrics.request_seconds.observe(total, view=url_name)
+        if self._show_timings(request):
+            response['Server-Timing'] = timings.server_timing(total)
+        self._log_slow(request, url_name, total, timings)
+        return response
+
+    @staticmethod
+    def _show_timings(request: HttpRequest) -> bool:
+        if settings.DEBUG or getattr(settings, 'SERVER_TIMING_PUBLIC', False):
+            return True
+        user = getattr(request, 'user', None)
+        return user is not None and user.is_authenticated and user.is_staff
+
+    @staticmethod
+    def _log_slow(request: HttpRequest, url_name: str, total: float, timings: RequestTimings) -> None:
+        if total * 1000 < getattr(settings, 'SLOW_REQUEST_MS', 500):
+            return
+        if random.random() >= getattr(settings, 'SLOW_REQUEST_SAMPLE_RATE', 1.0):
+            return
+        slowest = sorted(timings.queries, key=lambda query: query[1], reverse=True)[:20]
+        trace(
+            request.path, 'slow request', level=logging.WARNING,
+            url_name=url_name, ms=round(total * 1000, 1), query_count=len(timings.queries),
+            spans={name: round(seconds * 1000, 1) for name, (seconds, _) in timings.spans.items()},
+            queries=[{'sql': sql, 'ms': round(seconds * 1000, 2)} for sql, seconds in slowest],
+        )
+
+
+class TimedTemplate:
+    def __init__(self, template) -> None:
+        self.template = template
+        self.origin = template.origin
+
+    def render(self, context=None, request=None):
+        with timed('template'):
+            return self.template.render(context, request)
+
+
+class DjangoTemplates(BaseDjangoTemplates):
+    """The Django template backend, timing renders into the `template` span."""
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
@@ -0,0 +1,98 @@
+import contextvars
+import json
+import logging
+import random
+import re
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Optional, TypeVar
+
+T = TypeVar('T')
+
+logger = logging.getLogger('gelv')
+
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar('gelv_request_id', default=None)
+sampled: contextvars.ContextVar[bool] = contextvars.ContextVar('gelv_trace_sampled', default=True)
+
+
+def describe(x: Any) -> str:
+    """A log representation of a value; querysets are never evaluated just to be logged."""
+    from django.db.models.query import QuerySet
+    if isinstance(x, QuerySet) and x._result_cache is None:
+        return f'<unevaluated {type(x).__name__} of {x.model.__name__}>'
+    return str(x)
+
+
+class Lazy:
+    """Defers describe() until a handler actually formats the record."""
+    __slots__ = ('value',)
+
+    def __init__(self, value: Any) -> None:
+        self.value = value
+
+    def __str__(self) -> str:
+        return describe(self.value)
+
+
+def trace(x: T, comment: str = 'trace', level: int = logging.DEBUG, **fields: Any) -> T:
+    """
+    Log a value with a comment and return it, so it can wrap expressions.
+    Nothing is formatted unless the level is enabled (and, below WARNING, the request sampled);
+    then `fields` become keys of the structured record.
+    """
+    if not logger.isEnabledFor(level) or (level < logging.WARNING and not sampled.get()):
+        return x
+    logger.log(level, '%s: %s', comment, Lazy(x), extra={'fields': fields}, stacklevel=2)
+    return x
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamp records with the id of the request they were logged in."""
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, logger, message, request id, location and extra fields."""
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'where': f'{record.module}:{record.lineno}',
+            **getattr(record, 'fields', {}),
+        }
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, ensure_ascii=False)
+
+
+REQUEST_ID_PATTERN = re.compile(r'^[\w.-]{1,64}$')
+
+
+class RequestIdMiddleware:
+    """
+    Give each request a correlation id (the incoming X-Request-ID, if sane, else a new one),
+    echoed in the response, and decide whether its debug traces are sampled (settings.TRACE_SAMPLE_RATE).
+    """
+    def __init__(self, get_response: Callable) -> None:
+        self.get_response = get_response
+
+    def __call__(self, request):
+        from django.conf import settings
+        incoming = request.headers.get('X-Request-ID', '')
+        rid = incoming if REQUEST_ID_PATTERN.match(incoming) else uuid.uuid4().hex
+        rate = getattr(settings, 'TRACE_SAMPLE_RATE', 1.0)
+        id_token = request_id.set(rid)
+        sampled_token = sampled.set(rate >= 1 or random.random() < rate)
+        request.id = rid
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id.reset(id_token)
+            sampled.reset(sampled_token)
+        response['X-Request-ID'] = rid
+        return response
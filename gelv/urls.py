@@ -1,7 +1,7 @@
 from django.contrib.auth.views import LogoutView
 from django.conf.urls.static import static
 from django.urls import include, path
-from gelv.views import catalogue, subscribe, cart, auth, checkout, owned, download, posts
+from gelv.views import catalogue, subscribe, cart, auth, checkout, owned, download, posts, metrics
 from gelv.admin import admin_site
 from gelv.cart import Cart
 from gelv.settings import DEBUG, MEDIA_ROOT, MEDIA_URL
@@ -22,6 +22,9 @@ urlpatterns = [
     # User space
     path('owned/', owned.owned_view, name='owned'),
     path('download/<int:id>/', download.download_view, name='download'),
+    path('download/<int:id>/<str:token>/', download.signed_download_view, name='signed_download'),
+    path('download/bundle/<int:journal_id>/<int:year>/', download.journal_bundle_view, name='journal_bundle'),
+    path('download/bundle/subscription/<int:order_id>/', download.subscription_bundle_view, name='subscription_bundle'),
 
     # Store
     path('catalogue/', catalogue.catalogue_view, name='catalogue'),
@@ -34,10 +37,14 @@ urlpatterns = [
     path('cart/change_subscription_start/', cart.change_subscription_start, name='change_subscription_start'),
     path('cart/clear/', cart.clear_cart, name='clear_cart'),
     path('cart/count/', Cart.get_cart_count, name='cart_count'),
+    path('cart/api/add/', cart.add_to_cart_json, name='add_to_cart_json'),
+    path('cart/api/remove/', cart.remove_from_cart_json, name='remove_from_cart_json'),
+    path('cart/api/change_subscription_start/', cart.change_subscription_start_json, name='change_subscription_start_json'),
     path('checkout/', checkout.process_payment, name='checkout'),
 
     # Admin/Management
     path('admin/', admin_site.urls),
+    path('metrics/', metrics.metrics_view, name='metrics'),
 ]
 
 urlpatterns += static(MEDIA_URL, document_root=MEDIA_ROOT)
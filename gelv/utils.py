@@ -2,22 +2,16 @@ from django.http import HttpRequest, HttpResponse, QueryDict
 from django.utils import timezone
 from django.shortcuts import redirect
 from datetime import date
+import hashlib
 import json
-import logging
+import re
+import zlib
 from num2words import num2words  # type: ignore
-from typing import TypeAlias, Any
+from typing import TypeAlias, Any, NamedTuple, Optional
+from gelv.tracing import trace  # noqa: F401 (re-exported; it used to live here)
 
 JSON: TypeAlias = dict[str, Any]
 
-logger = logging.getLogger(__name__)
-logger.addHandler(logging.StreamHandler())
-logger.setLevel(logging.DEBUG)
-
-
-def trace(x, comment='trace'):
-    logger.debug(comment + ': ' + str(x))
-    return x
-
 
 class IssueNumber:
     number: int
@@ -26,6 +20,8 @@ class IssueNumber:
     anno_number = 1
     anno_year = 2010
 
+    pattern = re.compile(r'^(\d{1,2})/(\d{4})$')
+
     def __init__(self, n, frequency=12):
         self.year = self.anno_year + n // 12
         self.number = self.anno_number + n % 12
@@ -33,6 +29,17 @@ class IssueNumber:
     def __str__(self):
         return f'{self.number}/{self.year}'
 
+    @classmethod
+    def parse(cls, text: str) -> Optional[int]:
+        """Parse an 'N/YYYY' string into an issue number; None if it is not one."""
+        match = cls.pattern.match(text.strip())
+        if not match:
+            return None
+        number, year = map(int, match.groups())
+        if not (cls.anno_number <= number < cls.anno_number + 12) or year < cls.anno_year:
+            return None
+        return (year - cls.anno_year) * 12 + (number - cls.anno_number)
+
 
 def get_request_content(request: HttpRequest) -> JSON | QueryDict:
     if request.content_type == 'application/json':
@@ -60,6 +67,27 @@ def smart_redirect(request: HttpRequest, default: str = 'home') -> HttpResponse:
     return redirect(request.META.get('HTTP_REFERER', default))
 
 
+class FileDigest(NamedTuple):
+    sha256: str
+    size: int
+    crc32: int
+
+
+def file_digest(file) -> FileDigest:
+    """SHA-256 hex digest, size and CRC-32 of a (Django) file, read in chunks."""
+    digest, size, crc = hashlib.sha256(), 0, 0
+    was_closed = file.closed
+    file.open('rb')
+    try:
+        for chunk in file.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+            crc = zlib.crc32(chunk, crc)
+    finally:
+        file.close() if was_closed else file.seek(0)
+    return FileDigest(digest.hexdigest(), size, crc)
+
+
 def verbalize_price(price, language='lv') -> str:
     euros = num2words(round(price), lang=language)
     cents = str(round(price % 1 * 100))
@@ -1,3 +1,4 @@
+import logging
 from django.shortcuts import render, redirect
 from django.conf import settings
 from django.contrib.auth import login, authenticate
@@ -12,11 +13,14 @@ from django.urls import reverse
 from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
 from django.utils.encoding import force_bytes, force_str
 from django.views import View
+from gelv import metrics
 from gelv.utils import trace, smart_redirect
 from gelv.forms import CustomUserCreationForm
 from gelv.models import User
+from gelv.timing import timed_function
 
 
+@timed_function('mail')
 def send_confirm_mail(user: User, request=None) -> bool:
     token = default_token_generator.make_token(user)
     uid = urlsafe_base64_encode(force_bytes(user.pk))
@@ -49,10 +53,12 @@ def send_confirm_mail(user: User, request=None) -> bool:
             fail_silently=False,
         )
 
-        trace(f'confirmation email sent to {user.email}')
+        trace(user.email, 'confirmation email sent to')
+        metrics.emails.inc(kind='confirm', result='success')
         return True
     except Exception as e:
-        trace(e)
+        trace(e, 'sending confirmation email failed', level=logging.WARNING)
+        metrics.emails.inc(kind='confirm', result='failure')
         return False
 
 
@@ -83,7 +89,6 @@ class AuthView(View):
         if request.user.is_authenticated:
             return redirect('catalogue')
 
-        print('getting')
         login_form = AuthenticationForm()
         signup_form = CustomUserCreationForm()
 
@@ -105,7 +110,6 @@ class AuthView(View):
         signup_form = CustomUserCreationForm()
 
         if login_form.is_valid():
-            print("logging in")
             username = login_form.cleaned_data['username']
             password = login_form.cleaned_data['password']
             user = authenticate(request, username=username, password=password)
@@ -131,7 +135,7 @@ class AuthView(View):
 
         if signup_form.is_valid():
             user = signup_form.save()
-            trace(f'signing up as {user}')
+            trace(user, 'signing up as')
             # login(request, user)
             if send_confirm_mail(user, request):
                 messages.success(request, 'Account created successfully! Please check your inbox for a confirmation link.')
@@ -139,7 +143,7 @@ class AuthView(View):
                 messages.error(request, 'We couldn\'t send you a confirmation link. Please try again or contact us.')
             return smart_redirect(request, 'catalogue')
         else:
-            trace(signup_form)
+            trace(signup_form.errors, 'invalid signup form')
 
         return render(request, self.template_name, {
             'login_form': login_form,
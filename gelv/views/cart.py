@@ -1,8 +1,10 @@
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect
-from django.http import HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.views.decorators.http import require_POST
+from typing import Callable
+from gelv import metrics
 from gelv.utils import get_request_content, trace
 from gelv.models import Issue, Subscription, Payment
 from gelv.cart import Cart, CartItem
@@ -24,9 +26,8 @@ BILLING_DETAILS_FIELDS = [
 
 @login_required
 def cart_view(request: HttpRequest) -> HttpResponse:
-    """Display cart items from session and payment method selection"""
-    # get cart from session
-    cart = Cart.from_session(request.session)
+    """Display cart items and payment method selection"""
+    cart = Cart.from_request(request)
 
     context = {
         'user': request.user,
@@ -44,62 +45,115 @@ def cart_view(request: HttpRequest) -> HttpResponse:
 
 def clear_cart(request: HttpRequest) -> HttpResponse:
     """Clear all items from cart"""
-    request.session['cart'] = []
-    request.session.modified = True
+    Cart([]).save(request)
+    metrics.cart_operations.inc(action='clear', result='changed')
     messages.success(request, 'Cart cleared')
     return redirect(request.META.get('HTTP_REFERER', 'catalogue'))
 
 
-@require_POST
-def add_to_cart(request: HttpRequest) -> HttpResponse:
-    """Add item to cart"""
-    cart = Cart.from_session(request.session)
-    item = CartItem.from_singleton_request(request)
-    success = cart.add(item)
+CartAction = Callable[[HttpRequest, Cart, CartItem], tuple[bool, str]]
 
-    if success:
-        request.session['cart'] = cart.raw
-        request.session.modified = True
-        messages.success(request, f'{item.product} added to cart')
-    else:
-        messages.info(request, f'{item.product} is already in cart')
 
-    trace(f"cart is now {cart}")
-    return redirect(request.META.get('HTTP_REFERER', 'catalogue'))
+def _add(request: HttpRequest, cart: Cart, item: CartItem) -> tuple[bool, str]:
+    if cart.add(item):
+        return True, f'{item.product} added to cart'
+    return False, f'{item.product} is already in cart'
 
 
-@require_POST
-def remove_from_cart(request: HttpRequest) -> HttpResponse:
-    """Remove item from cart"""
-    cart = Cart.from_session(request.session)
-    item = CartItem.from_singleton_request(request)
-    success = cart.remove(item)
+def _remove(request: HttpRequest, cart: Cart, item: CartItem) -> tuple[bool, str]:
+    if cart.remove(item):
+        return True, f'{item.product} removed from cart'
+    return False, f'{item.product} is not in cart'
+
+
+def _change_start(request: HttpRequest, cart: Cart, item: CartItem) -> tuple[bool, str]:
+    try:
+        start = int(get_request_content(request).get('new_start', 0))
+    except TypeError:
+        raise ValueError('new_start is not an issue number')
+    if cart.edit_meta(item, start=start):
+        return True, ''
+    return False, 'Something went wrong.'
 
+
+def _perform(request: HttpRequest, action: CartAction) -> tuple[Cart, CartItem, bool, str]:
+    """Apply an action to the cart item in the request, saving the cart if it changed."""
+    cart = Cart.from_request(request)
+    item = CartItem.from_singleton_request(request)
+    success, message = action(request, cart, item)
     if success:
-        request.session['cart'] = cart.raw
-        request.session.modified = True
-        messages.success(request, f'{item.product} removed from cart')
+        cart.save(request)
+    metrics.cart_operations.inc(action=action.__name__.strip('_'), result='changed' if success else 'unchanged')
 
-    else:
-        messages.info(request, f'{item.product} is not in cart')
+    trace(cart, 'cart is now')
+    return cart, item, success, message
 
-    trace(f"cart is now {cart}")
+
+def _redirect_response(request: HttpRequest, action: CartAction) -> HttpResponse:
+    try:
+        _, _, success, message = _perform(request, action)
+    except (TypeError, ValueError):
+        success, message = False, 'Invalid cart item.'
+    if message:
+        (messages.success if success else messages.info)(request, message)
     return redirect(request.META.get('HTTP_REFERER', 'catalogue'))
 
 
+def _json_response(request: HttpRequest, action: CartAction) -> JsonResponse:
+    """The cart delta after an action: new count, total and the state of the changed item."""
+    try:
+        cart, item, success, message = _perform(request, action)
+    except (TypeError, ValueError):  # a malformed item, new_start or JSON body
+        return JsonResponse({'success': False, 'message': 'Invalid cart item.'}, status=400)
+    except Http404:
+        return JsonResponse({'success': False, 'message': 'This product is not available.'}, status=404)
+
+    in_cart = [i for i in cart.items if i.product == item.product]
+    return JsonResponse({
+        'success': success,
+        'message': message,
+        'cart_count': len(cart),
+        'total': round(cart.total_price, 2),
+        'item': {
+            'type': type(item.product).__name__.lower(),
+            'id': item.product.id,
+            'in_cart': bool(in_cart),
+            'metadata': in_cart[0].metadata if in_cart else item.metadata,
+        },
+    })
+
+
+@require_POST
+def add_to_cart(request: HttpRequest) -> HttpResponse:
+    """Add item to cart"""
+    return _redirect_response(request, _add)
+
+
+@require_POST
+def remove_from_cart(request: HttpRequest) -> HttpResponse:
+    """Remove item from cart"""
+    return _redirect_response(request, _remove)
+
+
 @require_POST
 def change_subscription_start(request: HttpRequest) -> HttpResponse:
     """Change metadata['start'] of a subscription"""
-    cart = Cart.from_session(request.session)
-    item = CartItem.from_singleton_request(request)
-    success = cart.edit_meta(item, start=int(get_request_content(request).get('new_start', 0)))
+    return _redirect_response(request, _change_start)
 
-    if success:
-        request.session['cart'] = cart.raw
-        request.session.modified = True
-    else:
-        messages.info(request, 'Something went wrong.')
 
-    trace(f"cart is now {cart}")
+@require_POST
+def add_to_cart_json(request: HttpRequest) -> JsonResponse:
+    """Add item to cart, answering with the cart delta"""
+    return _json_response(request, _add)
 
-    return redirect(request.META.get('HTTP_REFERER', 'catalogue'))
+
+@require_POST
+def remove_from_cart_json(request: HttpRequest) -> JsonResponse:
+    """Remove item from cart, answering with the cart delta"""
+    return _json_response(request, _remove)
+
+
+@require_POST
+def change_subscription_start_json(request: HttpRequest) -> JsonResponse:
+    """Change metadata['start'] of a subscription, answering with the cart delta"""
+    return _json_response(request, _change_start)
@@ -1,12 +1,14 @@
 from django.shortcuts import render, get_object_or_404
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models.query import QuerySet
 from django.http.response import HttpResponse
 from django.http.request import HttpRequest
 from django.db.models import Q, Count
 from gelv.models import Issue, Journal, IssueOrder, User
-from gelv.cart import Cart
+from gelv.cart_store import get_cart_store
+from gelv.search import search
+from gelv.pagination import paginate
+from gelv.caching import cached
 from gelv.utils import trace
 
 
@@ -17,7 +19,6 @@ def catalogue_view(request: HttpRequest) -> HttpResponse:
     journal_id = request.GET.get('journal', '')
     search_query = request.GET.get('search', '')
     sort_by = request.GET.get('sort', 'name')  # name, price_low, price_high, newest
-    page = request.GET.get('page', 1)
 
     filters = Q()
     # journal filter
@@ -27,34 +28,24 @@ def catalogue_view(request: HttpRequest) -> HttpResponse:
         except (ValueError, TypeError):
             pass
 
-    # search filter
-    # TODO: make it work with issue numbers
-    if search_query:
-        filters &= (
-            Q(journal__name__icontains=search_query) | Q(description__icontains=search_query)
-        )
-
     # sorting
     order_by = {
         'price_low': 'price',
         'price_high': '-price',
         'newest': '-id',
         'name': 'journal__name'
-    }.get(sort_by, 'name')
+    }.get(sort_by, 'journal__name')
 
-    products = Issue.get_objects().filter(filters).order_by(order_by)
+    products = Issue.get_objects().filter(filters).select_related('journal')
+    # search filter, understands issue numbers like 3/2024
+    if search_query:
+        products = search(products, search_query)
 
     # get all journals for filter dropdown + product number
-    journals = Journal.objects.all().annotate(issue_count=Count('issue'))
+    journals = cached('journals', (Journal, Issue), lambda: list(Journal.objects.annotate(issue_count=Count('issue'))))
 
     # pagination
-    paginator = Paginator(products, 20)
-    try:
-        page_products = paginator.page(page)
-    except PageNotAnInteger:
-        page_products = paginator.page(1)
-    except EmptyPage:
-        page_products = paginator.page(paginator.num_pages)
+    page_products = paginate(request, products, order_by, 20, cache_models=(Journal, Issue))
 
     # Get user's owned products if logged in
     owned_product_ids = []
@@ -62,12 +53,12 @@ def catalogue_view(request: HttpRequest) -> HttpResponse:
         try:
             user = User.get_by_email(request.user.email)
             if user:
-                owned_product_ids = trace(user.get_owned_issues()).values_list('id', flat=True)
+                owned_product_ids = user.get_owned_issues().values_list('id', flat=True)
         except ObjectDoesNotExist as e:
             trace(e)
 
     # Get issues in cart
-    cart_items = [issue.product.id for issue in Cart.from_session(request.session).issues]
+    cart_items = [item['id'] for item in get_cart_store().load(request) if item['type'] == 'issue']
     trace(cart_items, 'cart items')
 
     context = {
@@ -76,7 +67,7 @@ def catalogue_view(request: HttpRequest) -> HttpResponse:
         'current_journal': int(journal_id) if journal_id else None,
         'search_query': search_query,
         'sort_by': sort_by,
-        'total_products': paginator.count,
+        'total_products': page_products.paginator.count,
         'owned_product_ids': owned_product_ids,
         'cart_items': cart_items,
         'sort_options': [
@@ -1,3 +1,4 @@
+import logging
 from django.template.loader import render_to_string
 from django.urls import reverse
 from django.conf import settings
@@ -7,13 +8,17 @@ from django.shortcuts import redirect
 from django.http import HttpRequest, HttpResponse
 from django.views.decorators.http import require_POST
 from django.db import transaction
+from gelv import metrics
 from gelv.variables import site_url
 from gelv.utils import get_request_content, trace
 from gelv.invoice import Invoice
+from gelv.jobs import enqueue_on_commit
+from gelv.timing import timed_function
 from gelv.views.cart import Cart, PAYMENT_METHODS, BILLING_DETAILS_FIELDS
 from gelv.models import Issue, Subscription, IssueOrder, SubscriptionOrder, User, Payment
 
 
+@timed_function('mail')
 def send_invoice_mail(user: User, invoice: Invoice, invoice_file: str) -> bool:
     site_name = getattr(settings, 'SITE_NAME', None)
     context = {
@@ -33,10 +38,12 @@ def send_invoice_mail(user: User, invoice: Invoice, invoice_file: str) -> bool:
         msg.attach_file(invoice_file)
         msg.send()
 
-        trace(user.email, f'invoice email for {invoice.number} (payment {invoice.payment.id}) sent to:')
+        trace(user.email, 'invoice email sent to', invoice=invoice.number)
+        metrics.emails.inc(kind='invoice', result='success')
         return True
     except Exception as e:
-        trace(e, f'send email for invoice {invoice.number} (payment {invoice.payment.id}) failed:')
+        trace(e, 'sending invoice email failed', level=logging.WARNING, invoice=invoice.number)
+        metrics.emails.inc(kind='invoice', result='failure')
         return False
 
 
@@ -44,13 +51,13 @@ def send_invoice_mail(user: User, invoice: Invoice, invoice_file: str) -> bool:
 @transaction.atomic
 def process_payment(request: HttpRequest) -> HttpResponse:
     """Process payment and create orders"""
-    print("init payment")
+    metrics.checkouts_started.inc()
     data = get_request_content(request)
     payment_method = data.get('payment_method')
     email = data.get('email')
     billing_details = {field['id']: data.get(field['id']) for field in BILLING_DETAILS_FIELDS}
 
-    cart = Cart.from_session(request.session)
+    cart = Cart.from_request(request)
     if not cart:
         messages.error(request, 'Cart is empty')
         return redirect(request.META.get('HTTP_REFERER', 'catalogue'))
@@ -83,27 +90,27 @@ def process_payment(request: HttpRequest) -> HttpResponse:
     payment = Payment.objects.create(user=user, **billing_details)
 
     # TODO: make it declarative in the Cart class
-    for sub in cart.subscriptions:
-        if isinstance(sub.product, Subscription):
-            SubscriptionOrder.objects.create(product=sub.product, payment=payment, price=sub.product.current_price, **sub.metadata)
-    for issue in cart.issues:
-        if isinstance(issue.product, Issue):
-            IssueOrder.objects.create(product=issue.product, payment=payment, price=issue.product.current_price, **issue.metadata)
+    # bulk inserts skip the per-order signals; the payment is unpaid, so they have nothing to sync
+    SubscriptionOrder.objects.bulk_create(
+        SubscriptionOrder(product=sub.product, payment=payment, price=sub.product.current_price, **sub.metadata)
+        for sub in cart.subscriptions if isinstance(sub.product, Subscription)
+    )
+    IssueOrder.objects.bulk_create(
+        IssueOrder(product=issue.product, payment=payment, price=issue.product.current_price, **issue.metadata)
+        for issue in cart.issues if isinstance(issue.product, Issue)
+    )
+    payment.update_totals()
 
-    # generate and send invoice
-    invoice = payment.generate_invoice()
-    success = send_invoice_mail(user, invoice, payment.invoice.path)
-    if success:
-        messages.success(request, 'Order completed! Please check your inbox for an invoice.')
-    else:
-        messages.error(request, 'Order completed! But we couldn\'t send you an invoice. Please contact us.')
+    # generate and send the invoice in the background, once the orders are committed
+    enqueue_on_commit('send_invoice', payment_id=payment.id)
+    messages.success(request, 'Order completed! Your invoice will arrive in your inbox shortly.')
 
     # save billing details to the user
     for attr, value in billing_details.items():
         setattr(user, attr, value)
     user.save()
 
-    # clear cart from session
-    request.session['cart'] = []
-    request.session.modified = True
+    # clear cart
+    Cart([]).save(request)
+    transaction.on_commit(metrics.checkouts_completed.inc)
     return redirect('home')
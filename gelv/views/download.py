@@ -1,23 +1,162 @@
+import os
+from functools import partial
 from django.contrib import messages
+from django.http import Http404, StreamingHttpResponse
+from django.shortcuts import redirect
 from django.http.request import HttpRequest
 from django.http.response import HttpResponse, FileResponse
 from django.contrib.auth.decorators import login_required
-from gelv.models import User, Issue
-from gelv.utils import smart_redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils import timezone
+from django.utils.http import content_disposition_header, http_date, quote_etag
+from django.views.decorators.http import require_safe
+from typing import Optional
+from gelv import download_links, metrics
+from gelv.audit import download_log
+from gelv.caching import cached
+from gelv.models import DownloadEvent, Issue, SubscriptionOrder
+from gelv.delivery import get_delivery_backend
+from gelv.entitlements import owns_issue
+from gelv.utils import smart_redirect, IssueNumber
+from gelv.zipstream import ZipEntry, ZipStream
 
 
+def _issue_file(id: int) -> Optional[Issue]:
+    """An unsaved Issue carrying just the file and its validators, cached until issues change."""
+    def load() -> dict:
+        values = Issue.objects.filter(pk=id).values('file', 'file_hash', 'file_size', 'file_modified').first()
+        return values or {}
+    values = cached('issue-file', (Issue,), load, id)
+    return Issue(id=id, **values) if values else None
+
+
+def _serve(request: HttpRequest, issue: Issue) -> HttpResponse:
+    if not issue.file:
+        raise ValueError(f'issue {issue.id} has no file')
+
+    # validators are stored with the file, so revalidation never touches the disk
+    etag = quote_etag(issue.file_hash) if issue.file_hash else None
+    last_modified = int(issue.file_modified.timestamp()) if issue.file_modified else None
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = get_delivery_backend().serve(request, issue.file, size=issue.file_size, etag=etag)
+    if etag:
+        response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def _log(request: HttpRequest, response: HttpResponse, user_id: int, issue: Issue, kind: str) -> HttpResponse:
+    """
+    Record a download; range requests count once, by the one starting at the first byte.
+    Bytes count every range; files handed to the web server count their full size.
+    """
+    if request.method != 'GET' or response.status_code not in (200, 206):
+        return response
+    if response.status_code == 200 or response.get('Content-Range', '').startswith('bytes 0-'):
+        download_log.record(user_id, issue.id, kind)
+        metrics.downloads.inc(kind=kind)
+    size = int(response['Content-Length']) if response.has_header('Content-Length') else issue.file_size
+    metrics.download_bytes.inc(size or 0, kind=kind)
+    return response
+
+
+@require_safe
 @login_required
 def download_view(request: HttpRequest, id) -> FileResponse | HttpResponse:
-    if request.user.is_authenticated:
-        user = User.get_by_email(request.user.email)
-        owned_issue_ids = user.get_owned_issues().values_list('id', flat=True)
-
-    if id in owned_issue_ids:
+    if owns_issue(request.user, id):
         try:
-            return FileResponse(Issue.objects.get(pk=id).file)
-        except ValueError:
+            issue = _issue_file(id)
+            if issue is None:
+                raise Issue.DoesNotExist
+            return _log(request, _serve(request, issue), request.user.id, issue, DownloadEvent.SINGLE)
+        except (ValueError, FileNotFoundError, Issue.DoesNotExist):
             messages.error(request, 'We could not find the file. Please contact us.')
     else:
         messages.error(request, 'You do not have the right to download this.')
 
     return smart_redirect(request, 'owned')
+
+
+@require_safe
+def signed_download_view(request: HttpRequest, id: int, token: str) -> HttpResponse:
+    """
+    Download by a link from download_links: the signature is the credential,
+    so neither the session nor ownership is looked up (parallel range requests stay cheap).
+    Invalid or expired links fall back to the regular, fully checked download.
+    """
+    user_id = download_links.verify(download_links.get_key(), id, token)
+    issue = _issue_file(id) if user_id is not None else None
+    if issue is None or not issue.file:
+        return redirect('download', id=id)
+    try:
+        return _log(request, _serve(request, issue), user_id, issue, DownloadEvent.SIGNED)
+    except FileNotFoundError:
+        return redirect('download', id=id)
+
+
+def _bundle_response(request: HttpRequest, issues: list[Issue], filename: str) -> HttpResponse:
+    """Stream owned issues as a zip of stored entries, with an exact Content-Length."""
+    entries = []
+    for issue in issues:
+        if not issue.file or not issue.file.storage.exists(issue.file.name):
+            continue
+        if issue.file_crc32 is None or issue.file_size is None:
+            # files from before the checksums were stored get them now, once
+            issue.update_file_metadata()
+            if issue.file_crc32 is None:
+                continue
+            Issue.objects.filter(pk=issue.id).update(
+                **{field: getattr(issue, field) for field in Issue.file_metadata_fields}
+            )
+        name = f'{issue}'.replace('/', '-') + os.path.splitext(issue.file.name)[1]
+        modified = timezone.localtime(issue.file_modified) if issue.file_modified else timezone.localtime()
+        entries.append(ZipEntry(name, issue.file_size, issue.file_crc32, modified, partial(issue.file.open, 'rb')))
+        if request.method == 'GET':
+            download_log.record(request.user.id, issue.id, DownloadEvent.BUNDLE)
+
+    archive = ZipStream(entries)
+    if request.method == 'GET':
+        metrics.downloads.inc(kind=DownloadEvent.BUNDLE)
+        metrics.download_bytes.inc(len(archive), kind=DownloadEvent.BUNDLE)
+    response = StreamingHttpResponse(archive, content_type='application/zip')
+    response['Content-Length'] = len(archive)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@require_safe
+@login_required
+def journal_bundle_view(request: HttpRequest, journal_id: int, year: int) -> HttpResponse:
+    """All owned issues of a journal's year as one zip."""
+    first = IssueNumber.parse(f'{IssueNumber.anno_number}/{year}')
+    if first is None:
+        raise Http404
+    issues = list(
+        request.user.get_owned_issues().filter(journal=journal_id, number__gte=first, number__lt=first + 12)
+        .select_related('journal').order_by('number')
+    )
+    if not issues:
+        messages.error(request, 'You do not own any issues of that year.')
+        return smart_redirect(request, 'owned')
+    return _bundle_response(request, issues, f'{issues[0].journal.name} {year}.zip')
+
+
+@require_safe
+@login_required
+def subscription_bundle_view(request: HttpRequest, order_id: int) -> HttpResponse:
+    """All issues published so far within a paid subscription order, as one zip."""
+    order = SubscriptionOrder.objects.filter(
+        pk=order_id, payment__user=request.user.id, payment__paid=True
+    ).select_related('product__journal').first()
+    if order is None:
+        messages.error(request, 'You do not have the right to download this.')
+        return smart_redirect(request, 'owned')
+    issues = list(order.get_issues().select_related('journal').order_by('number'))
+    if not issues:
+        messages.error(request, 'No issues of this subscription have been published yet.')
+        return smart_redirect(request, 'owned')
+    return _bundle_response(request, issues, f'{order}.zip'.replace('/', '-'))
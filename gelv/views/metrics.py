@@ -0,0 +1,32 @@
+import hmac
+import ipaddress
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_safe
+from gelv import metrics
+
+
+def _allowed(request: HttpRequest) -> bool:
+    """
+    Staff, a scraper with the bearer token in settings.METRICS_TOKEN,
+    or a client address within settings.METRICS_ALLOWED_IPS (addresses or networks).
+    """
+    if request.user.is_authenticated and request.user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token and hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return True
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ipaddress.ip_network(network, strict=False)
+               for network in getattr(settings, 'METRICS_ALLOWED_IPS', ()))
+
+
+@require_safe
+def metrics_view(request: HttpRequest) -> HttpResponse:
+    """Shop metrics of all worker processes, in the Prometheus text format."""
+    if not _allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -1,7 +1,11 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
 from django.http import HttpRequest, HttpResponse
-from ..models import User
+from django.db.models import F
+from ..models import User, SubscriptionOrder
+from ..utils import IssueNumber
+from ..pagination import paginate
+from ..download_links import signed_url
 
 
 @login_required
@@ -10,10 +14,26 @@ def owned_view(request: HttpRequest) -> HttpResponse:
 
     # get user's purchased products
     user = User.get_by_email(request.user.email)
-    owned_issues = user.get_owned_issues()
+    owned_issues = user.get_owned_issues().select_related('journal')
+
+    products = paginate(request, owned_issues, '-number', 20)
+    for product in products:
+        product.download_url = signed_url(user.id, product.id)
+
+    # whole years and subscriptions, downloadable as one zip each
+    years = [
+        {**row, 'year': IssueNumber.anno_year + row['year_ix']}
+        for row in owned_issues.order_by().annotate(year_ix=F('number') / 12)
+        .values('journal_id', 'journal__name', 'year_ix').distinct().order_by('journal__name', '-year_ix')
+    ]
+    subscriptions = SubscriptionOrder.objects.filter(
+        payment__user=user.id, payment__paid=True
+    ).select_related('product__journal').order_by('-start')
 
     context = {
         'user': user,
-        'products': owned_issues,
+        'products': products,
+        'years': years,
+        'subscriptions': subscriptions,
     }
     return render(request, 'account/owned.html', context)
@@ -4,9 +4,10 @@ from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.core.exceptions import ObjectDoesNotExist
 from django.http.response import HttpResponse
 from django.http.request import HttpRequest
-from django.db.models import Q, Count
+from django.db.models import Q, Count, Prefetch
 from typing import List
 from ..models import Subscription, User, SubscriptionOrder, Journal
+from ..caching import cached
 
 
 def get_user_subs(user: User | AnonymousUser) -> List[int]:
@@ -25,9 +26,11 @@ def get_user_subs(user: User | AnonymousUser) -> List[int]:
 def subscribe_view(request: HttpRequest) -> HttpResponse:
     """Subscription page view"""
 
-    journals = Journal.objects.annotate(sub_count=Count('subscription')).filter(sub_count__gt=0)
-
-    print(journals[0].get_subscriptions())
+    journals = cached('subscribe-journals', (Journal, Subscription), lambda: list(
+        Journal.objects.annotate(sub_count=Count('subscription')).filter(sub_count__gt=0).prefetch_related(
+            Prefetch('subscription_set', queryset=Subscription.get_objects(), to_attr='active_subscriptions')
+        )
+    ))
 
     context = {
         'journals': journals,
@@ -0,0 +1,106 @@
+import struct
+from datetime import datetime
+from typing import IO, Callable, Iterator, NamedTuple
+
+CHUNK_SIZE = 64 * 1024
+ZIP32_LIMIT = 0xFFFFFFFF
+ZIP64_VERSION = 45
+ZIP32_VERSION = 20
+UTF8_FLAG = 0x800
+
+
+class ZipEntry(NamedTuple):
+    name: str
+    size: int
+    crc32: int
+    modified: datetime
+    open: Callable[[], IO[bytes]]
+
+
+class ZipStream:
+    """
+    A zip archive of stored (uncompressed) entries, generated on the fly in constant memory.
+    Sizes and CRCs are known upfront, so entries need no data descriptors
+    and the archive's length is known before the first byte (for Content-Length).
+    ZIP64 records are added only where sizes or offsets need them.
+    """
+    def __init__(self, entries: list[ZipEntry]) -> None:
+        self.entries = entries
+
+    @staticmethod
+    def _dos_time(moment: datetime) -> tuple[int, int]:
+        year = min(max(moment.year, 1980), 2107)
+        return (
+            moment.hour << 11 | moment.minute << 5 | moment.second // 2,
+            (year - 1980) << 9 | moment.month << 5 | moment.day,
+        )
+
+    def _local_header(self, entry: ZipEntry) -> bytes:
+        name = entry.name.encode()
+        zip64 = entry.size >= ZIP32_LIMIT
+        extra = struct.pack('<HHQQ', 1, 16, entry.size, entry.size) if zip64 else b''
+        size = ZIP32_LIMIT if zip64 else entry.size
+        time, day = self._dos_time(entry.modified)
+        return struct.pack(
+            '<IHHHHHIIIHH', 0x04034B50, ZIP64_VERSION if zip64 else ZIP32_VERSION, UTF8_FLAG, 0,
+            time, day, entry.crc32, size, size, len(name), len(extra),
+        ) + name + extra
+
+    def _central_header(self, entry: ZipEntry, offset: int) -> bytes:
+        name = entry.name.encode()
+        zip64_fields = []
+        if entry.size >= ZIP32_LIMIT:
+            zip64_fields += [entry.size, entry.size]
+        if offset >= ZIP32_LIMIT:
+            zip64_fields.append(offset)
+        extra = struct.pack(f'<HH{len(zip64_fields)}Q', 1, 8 * len(zip64_fields), *zip64_fields) if zip64_fields else b''
+        version = ZIP64_VERSION if zip64_fields else ZIP32_VERSION
+        size = min(entry.size, ZIP32_LIMIT)
+        time, day = self._dos_time(entry.modified)
+        return struct.pack(
+            '<IHHHHHHIIIHHHHHII', 0x02014B50, version, version, UTF8_FLAG, 0, time, day,
+            entry.crc32, size, size, len(name), len(extra), 0, 0, 0, 0, min(offset, ZIP32_LIMIT),
+        ) + name + extra
+
+    def _end(self, directory_offset: int, directory_size: int) -> bytes:
+        count = len(self.entries)
+        end = b''
+        if count >= 0xFFFF or directory_offset >= ZIP32_LIMIT or directory_size >= ZIP32_LIMIT:
+            zip64_end_offset = directory_offset + directory_size
+            end += struct.pack(
+                '<IQHHIIQQQQ', 0x06064B50, 44, ZIP64_VERSION, ZIP64_VERSION, 0, 0,
+                count, count, directory_size, directory_offset,
+            )
+            end += struct.pack('<IIQI', 0x07064B50, 0, zip64_end_offset, 1)
+        return end + struct.pack(
+            '<IHHHHIIH', 0x06054B50, 0, 0, min(count, 0xFFFF), min(count, 0xFFFF),
+            min(directory_size, ZIP32_LIMIT), min(directory_offset, ZIP32_LIMIT), 0,
+        )
+
+    def _layout(self) -> tuple[list[int], int, int]:
+        """Entry offsets, central directory offset and size."""
+        offsets, offset = [], 0
+        for entry in self.entries:
+            offsets.append(offset)
+            offset += len(self._local_header(entry)) + entry.size
+        directory = sum(len(self._central_header(entry, o)) for entry, o in zip(self.entries, offsets))
+        return offsets, offset, directory
+
+    def __len__(self) -> int:
+        offsets, directory_offset, directory_size = self._layout()
+        return directory_offset + directory_size + len(self._end(directory_offset, directory_size))
+
+    def __iter__(self) -> Iterator[bytes]:
+        offsets, directory_offset, directory_size = self._layout()
+        for entry in self.entries:
+            yield self._local_header(entry)
+            remaining = entry.size
+            with entry.open() as f:
+                while remaining > 0:
+                    chunk = f.read(min(CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise IOError(f'{entry.name} is shorter than its recorded size')
+                    remaining -= len(chunk)
+                    yield chunk
+        yield b''.join(self._central_header(entry, offset) for entry, offset in zip(self.entries, offsets))
+        yield self._end(directory_offset, directory_size)